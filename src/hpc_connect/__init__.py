@@ -53,8 +53,6 @@ else:
 
 
 def get_backend(arg: str | None = None) -> Backend:
-    import copy
-
     from .config import get_config
     from .pluginmanager import get_pluginmanager
     from .schemas import backend_schema
@@ -83,20 +81,19 @@ def get_backend(arg: str | None = None) -> Backend:
         type = name
 
     pm = get_pluginmanager()
-    backend_t: Type[Backend] | None
-    for backend_t in pm.hook.hpc_connect_backend():
-        if backend_t is not None and backend_t.matches(type):
+    backend_t: Type[Backend]
+    for backend_t in pm.backend_types():
+        if backend_t.matches(type):
             break
     else:
         raise ValueError(f"{type}: backend not registered with hpc_connect")
 
     # Make the config for the backend
-    defaults = copy.deepcopy(backend_t.default_config())
-    backend_config = backend_schema.validate(defaults)
+    backend_config = backend_schema.validate_memoized(backend_t.default_config())
 
     if overrides := config.backend(name):
         collections.merge(backend_config, overrides)
-        backend_config = backend_schema.validate(backend_config)
+        backend_config = backend_schema.validate_memoized(backend_config)
 
     return backend_t(cfg=backend_config)
 
@@ -105,4 +102,4 @@ def backends() -> list[str]:
     from .pluginmanager import get_pluginmanager
 
     pm = get_pluginmanager()
-    return [b.name for b in pm.hook.hpc_connect_backend() if b is not None]
+    return [b.type for b in pm.backend_types()]
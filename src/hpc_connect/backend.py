@@ -1,6 +1,4 @@
 import abc
-import copy
-import io
 import logging
 import math
 from functools import cached_property
@@ -36,6 +34,8 @@ class Backend(abc.ABC):
             alias: canonical for canonical, aliases in rtype_aliases.items() for alias in aliases
         }
         self._resource_index: dict[str, list[tuple[dict, str | None]]] | None = None
+        self._resource_views: dict[tuple[int | None, int | None], dict[str, int]] = {}
+        self._counts_per_node: dict[str, int | None] = {}
 
     @classmethod
     @abc.abstractmethod
@@ -68,20 +68,17 @@ class Backend(abc.ABC):
     def configure(self, cfg: dict[str, Any] | None = None) -> dict[str, Any]:
         if self._configured:
             raise RuntimeError("Backend is frozen; configure() is not allowed")
-        cfg = copy.deepcopy(cfg or self.default_config())
-        return backend_schema.validate(cfg)
+        return backend_schema.validate_memoized(cfg or self.default_config())
 
     def describe(self) -> str:
-        fp = io.StringIO()
-        fp.write(f"Name: {self.name}\n")
-        fp.write(f"Type: {self.type}\n")
-        fp.write("Available resources:\n")
-        fp.write(f"  Nodes: {self.node_count}\n")
+        lines: list[str] = [f"Name: {self.name}", f"Type: {self.type}"]
+        lines.append("Available resources:")
+        lines.append(f"  Nodes: {self.node_count}")
         for rtype in self.resource_types():
             if rtype == "node":
                 continue
-            fp.write(f"  {rtype}s per node: {self.count_per_node(rtype)}\n")
-        return fp.getvalue().strip()
+            lines.append(f"  {rtype}s per node: {self.count_per_node(rtype)}")
+        return "\n".join(lines).strip()
 
     def supports_subscheduling(self) -> bool:
         return False
@@ -126,9 +123,21 @@ class Backend(abc.ABC):
         return sorted(types)
 
     def count_per_node(self, rtype: str, default: int | None = None) -> int:
+        # The resource index is fixed once built: walk it once per resource type
+        rtype = self.canonical_type_name(rtype)
+        if rtype not in self._counts_per_node:
+            self._counts_per_node[rtype] = self._count_per_node(rtype)
+        if (count := self._counts_per_node[rtype]) is not None:
+            return count
+        if default is not None:
+            return default
+        raise ValueError(
+            f"Unable to determine count_per_node for {rtype!r} from {self.resource_specs}"
+        ) from None
+
+    def _count_per_node(self, rtype: str) -> int | None:
         total = 0
         found = False
-        rtype = self.canonical_type_name(rtype)
         for spec, parent in self.resource_index.get(rtype, []):
             # Walk up until we hit node
             multiplier = spec["count"]
@@ -142,13 +151,7 @@ class Backend(abc.ABC):
             if p == "node":
                 found = True
                 total += multiplier
-        if found:
-            return total
-        if default is not None:
-            return default
-        raise ValueError(
-            f"Unable to determine count_per_node for {rtype!r} from {self.resource_specs}"
-        ) from None
+        return total if found else None
 
     def count_per_socket(self, rtype: str, default: int | None = None) -> int:
         rtype = self.canonical_type_name(rtype)
@@ -191,7 +194,7 @@ class Backend(abc.ABC):
             except ValueError:
                 continue
             if per_node > 0:
-                nodes = max(nodes, int(math.ceil(count / per_node)))
+                nodes = max(nodes, int(-(-count // per_node)))
         return nodes
 
     def _canonicalize_rspec(self, rspec: dict) -> None:
@@ -227,6 +230,13 @@ class Backend(abc.ABC):
           view['ranks_per_socket']
 
         """
+        # The backend's configuration is frozen, so a view depends only on its arguments
+        key = (ranks, ranks_per_socket)
+        if key not in self._resource_views:
+            self._resource_views[key] = self._make_resource_view(ranks, ranks_per_socket)
+        return dict(self._resource_views[key])
+
+    def _make_resource_view(self, ranks: int | None, ranks_per_socket: int | None) -> dict[str, int]:
         if ranks is None and ranks_per_socket is not None:
             # Raise an error since there is no reliable way of finding the number of
             # available nodes
@@ -48,7 +48,7 @@ import argparse
 import sys
 from types import ModuleType
 
-from ..config import Config
+from ..config import get_config
 from . import config
 from . import launch
 
@@ -64,7 +64,8 @@ def main(argv: list[str] | None = None) -> int:
     args.extra_args = extra_args
 
     module = _commands[args.command]
-    cfg = Config()
+    # get_backend() reads the shared config: build it once, rather than a second copy here
+    cfg = get_config()
     cfg.set_main_options(args)
     module.execute(cfg, args)  # ty: ignore[unresolved-attribute]
     return 0
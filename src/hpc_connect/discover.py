@@ -3,21 +3,38 @@
 # SPDX-License-Identifier: MIT
 
 import fnmatch
+import functools
 import json
 import os
+import re
 from typing import Any
 
-import psutil
+from .util import cpu_count
 
 
 def default_resource_set() -> list[dict[str, Any]]:
     if file := os.getenv("HPC_CONNECT_HOSTFILE"):
-        with open(file) as fh:
-            data = json.load(fh)
         host: str = os.getenv("HPC_CONNECT_HOSTNAME") or os.uname().nodename
-        for pattern, rspec in data.items():
-            if fnmatch.fnmatch(host, pattern):
-                return rspec
-    local_resource = {"type": "cpu", "count": psutil.cpu_count()}
+        if rspec := hostfile_spec(file, host):
+            return rspec
+    local_resource = {"type": "cpu", "count": cpu_count()}
     socket_resource = {"type": "socket", "count": 1, "resources": [local_resource]}
     return [{"type": "node", "count": 1, "resources": [socket_resource]}]
+
+
+def hostfile_spec(file: str, host: str) -> list[dict[str, Any]] | None:
+    """The resource spec for ``host`` in the JSON hostfile ``file``, or None if no pattern in it
+    matches the host.  The caller owns the returned spec"""
+    for rx, text in read_hostfile(file, os.stat(file).st_mtime_ns):
+        if rx.match(host):
+            return json.loads(text)
+    return None
+
+
+@functools.lru_cache(maxsize=4)
+def read_hostfile(file: str, mtime_ns: int) -> tuple[tuple[re.Pattern, str], ...]:
+    """Read ``file`` into (compiled host pattern, serialized resource spec) pairs.  ``mtime_ns``
+    is only part of the cache key, so that an edited hostfile is read again"""
+    with open(file) as fh:
+        data = json.load(fh)
+    return tuple((re.compile(fnmatch.translate(p)), json.dumps(r)) for p, r in data.items())
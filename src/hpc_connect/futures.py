@@ -1,6 +1,7 @@
 # Copyright NTESS. See COPYRIGHT file for details.
 #
 # SPDX-License-Identifier: MIT
+import queue
 import threading
 import time
 from collections import defaultdict
@@ -34,7 +35,7 @@ class Future:
 
     def _pop_callbacks(self, event: CallbackEventT) -> list[Callable[["Future"], None]]:
         with self._lock:
-            return list(self._callbacks.pop(event, []))
+            return self._callbacks.pop(event, [])
 
     def _safeexec(self, callback: Callable[["Future"], None]) -> None:
         try:
@@ -48,10 +49,21 @@ class Future:
             self._safeexec(cb)
 
     def _monitor(self):
+        # Back off from a fraction of the polling interval up to the full interval: short jobs are
+        # seen to finish promptly, long ones are not polled more often than configured.  The
+        # backoff restarts whenever the job changes state.  Processes whose poll runs a scheduler
+        # command are never polled more often than configured
+        interval = self._polling_interval
+        initial = interval
+        if self.proc.cheap_poll:
+            initial = min(interval, max(0.01, interval / 8))
+        delay = initial
+        state = (False, False)
         while True:
-            if self.proc.started > 0.0:
+            started, has_jobid = self.proc.started > 0.0, self.proc.jobid != "unset"
+            if started:
                 self._exec_callbacks("start")
-            if self.proc.jobid != "unset":
+            if has_jobid:
                 self._exec_callbacks("jobid")
             if self.proc.poll() is not None:
                 self._done.set()
@@ -59,7 +71,10 @@ class Future:
                 break
             if self._cancelled:
                 break
-            time.sleep(self._polling_interval)
+            if (started, has_jobid) != state:
+                state, delay = (started, has_jobid), initial
+            self.proc.wait(delay)
+            delay = min(delay * 1.5, interval)
 
     def done(self) -> bool:
         return self._done.is_set()
@@ -77,13 +92,29 @@ class Future:
             except Exception:  # nosec B110
                 pass
             self._done.set()
-            callbacks = list(self._callbacks.pop("done", []))
+            callbacks = self._callbacks.pop("done", [])
         for cb in callbacks:
             self._safeexec(cb)
         return True
 
+    def _claim_cancel(self) -> bool:
+        with self._lock:
+            if self.done() or self._cancelled:
+                return False
+            self._cancelled = True
+            return True
+
+    def _finish_cancel(self) -> None:
+        self._done.set()
+        self._exec_callbacks("done")
+
     def result(self, timeout: Optional[float] = None) -> int:
-        finished = self._done.wait(timeout=timeout)
+        try:
+            finished = self._done.wait(timeout=timeout)
+        except KeyboardInterrupt:
+            if self.proc.cancel_on_interrupt:
+                self.cancel()
+            raise
         if not finished:
             raise TimeoutError(f"Job {self.proc.jobid} did not finish in time")
         rc = 1 if not isinstance(self.proc.returncode, int) else self.proc.returncode
@@ -123,6 +154,22 @@ class Future:
         return self.proc.returncode
 
 
+def cancel_futures(futures: Iterable["Future"]) -> None:
+    """Cancel ``futures``, handing the jobs of each process type to that type's ``cancel_many``
+    so that backends can cancel them with one scheduler command"""
+    claimed = [fut for fut in futures if fut._claim_cancel()]
+    by_type: dict[type["HPCProcess"], list["HPCProcess"]] = defaultdict(list)
+    for fut in claimed:
+        by_type[type(fut.proc)].append(fut.proc)
+    for proc_type, procs in by_type.items():
+        try:
+            proc_type.cancel_many(procs)
+        except Exception as e:
+            print(f"Warning: failed to cancel {len(procs)} jobs: {e}")
+    for fut in claimed:
+        fut._finish_cancel()
+
+
 def as_completed(
     futures: Iterable["Future"],
     timeout: float | None = None,
@@ -135,7 +182,7 @@ def as_completed(
     Args:
         futures: Iterable of HPCFuture objects to monitor.
         timeout: Maximum number of seconds to wait for all futures. If None, wait indefinitely.
-        polling_interval: Seconds between checks of each future's done() status.
+        polling_interval: Unused: completion is signalled by the futures themselves.
         cancel_on_exception: If True, cancel all pending futures if an exception occurs during iteration.
 
     Yields:
@@ -148,42 +195,36 @@ def as_completed(
                    cancelled first if cancel_on_exception is True.
     """
     pending = set(futures)
-    start_time = time.monotonic()
-    polling_interval = max(polling_interval, max([f._polling_interval for f in pending]))
+    # Each future signals its own completion: wait on a queue fed by done callbacks instead of
+    # checking every pending future once per polling interval
+    finished: "queue.SimpleQueue[Future]" = queue.SimpleQueue()
+    for fut in pending:
+        fut.add_done_callback(finished.put)
+    deadline = None if timeout is None else time.monotonic() + timeout
 
     try:
         while pending:
-            done_now = {fut for fut in pending if fut.done()}
-
-            # Yield all newly done futures
-            for fut in done_now:
-                yield fut
+            try:
+                if deadline is None:
+                    fut = finished.get()
+                else:
+                    fut = finished.get(timeout=max(deadline - time.monotonic(), 0.0))
+            except queue.Empty:
+                # Cancel all remaining pending HPC jobs
+                cancel_futures(pending)
+                raise TimeoutError(
+                    f"{len(pending)} futures did not complete within {timeout} seconds"
+                ) from None
+            if fut in pending:
                 pending.remove(fut)
+                yield fut
 
-            # Check for timeout
-            if timeout is not None and (time.monotonic() - start_time) >= timeout:
-                if pending:
-                    # Cancel all remaining pending HPC jobs
-                    for fut in pending:
-                        try:
-                            fut.cancel()
-                        except Exception as e:
-                            print(f"Warning: failed to cancel future {fut}: {e}")
-                    raise TimeoutError(
-                        f"{len(pending)} futures did not complete within {timeout} seconds"
-                    )
-                break
-
-            # Sleep briefly before polling again
-            if pending:
-                time.sleep(polling_interval)
+    except KeyboardInterrupt:
+        cancel_futures(fut for fut in pending if fut.proc.cancel_on_interrupt)
+        raise
 
     except Exception as e:
         # Optionally cancel pending futures on any exception
         if cancel_on_exception and pending:
-            for fut in pending:
-                try:
-                    fut.cancel()
-                except Exception as ce:
-                    print(f"Warning: failed to cancel future {fut}: {ce}")
+            cancel_futures(pending)
         raise  # propagate the original exception
@@ -7,7 +7,7 @@ from typing import Any
 from typing import Mapping
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class JobSpec:
     """
     Declarative description of a single job submission.
@@ -1,17 +1,17 @@
 # Copyright NTESS. See COPYRIGHT file for details.
 #
 # SPDX-License-Identifier: MIT
-import copy
+import functools
 import logging
 import os
 import shlex
-import shutil
 import subprocess
 from typing import Any
 from typing import Sequence
 
 from .backend import Backend
 from .schemas import launch_schema
+from .util import which
 
 logger = logging.getLogger("hpc_connect.launch")
 
@@ -41,8 +41,26 @@ class LaunchAdapter:
     name: str
 
     def __init__(self, *, config: dict[str, Any], backend: "Backend") -> None:
-        self.config = launch_schema.validate(copy.deepcopy(config))
+        self.config = launch_schema.validate_memoized(config)
         self.backend = backend
+        # The configured options are fixed: sort out which of them are %-templates once, rather
+        # than testing every option each time a command line is built
+        self.options: dict[str, list[tuple[str, bool]]] = {
+            "default_options": compile_options(self.config["default_options"]),
+            "pre_options": compile_options(self.config["pre_options"]),
+            "global_options": compile_options(self.config["mpmd"]["global_options"]),
+            "local_options": compile_options(self.config["mpmd"]["local_options"]),
+        }
+        self._expanded: dict[tuple[str, tuple[tuple[str, int], ...]], list[str]] = {}
+
+    @functools.cached_property
+    def executable(self) -> str:
+        """The launcher resolved on PATH, looked up once per adapter"""
+        name = self.config.get("exec") or self.name
+        exec = which(name)
+        if exec is None:
+            raise ValueError(f"{name}: executable not found on PATH")
+        return os.fsdecode(exec)
 
     def build_argv(self, args: list[str]) -> list[str]:
         specs = self.parse(args)
@@ -51,9 +69,31 @@ class LaunchAdapter:
     def join_specs(self, specs: list["LaunchSpec"]) -> list[str]:
         raise NotImplementedError
 
+    @functools.cached_property
+    def parser(self) -> "ArgumentParser":
+        return ArgumentParser(numproc_flag=self.config["numproc_flag"])
+
     def parse(self, args: list[str]) -> list["LaunchSpec"]:
-        parser = ArgumentParser(numproc_flag=self.config["numproc_flag"])
-        return parser.parse_args(args)
+        return self.parser.parse_args(args)
+
+    def expand_options(self, name: str, view: dict[str, int]) -> list[str]:
+        """Expand the configured ``name`` options against ``view``"""
+        options = self.options[name]
+        if not any(templated for _, templated in options):
+            return [text for text, _ in options]
+        # Launches of the same size see the same view: reuse their expansion
+        key = (name, tuple(view.items()))
+        if key not in self._expanded:
+            expand = self.expand_one
+            self._expanded[key] = [expand(text, **view) if t else text for text, t in options]
+        return list(self._expanded[key])
+
+    @staticmethod
+    def expand_args(args: list[str], view: dict[str, int]) -> list[str]:
+        """Expand the %-templates in a launch spec's ``args`` against ``view``"""
+        expand = LaunchAdapter.expand_one
+        # the view is only unpacked for arguments that actually have something to substitute
+        return [expand(arg, **view) if "%" in arg else arg for arg in args]
 
     @staticmethod
     def expand_inplace(args: list[str], **kwargs: Any) -> None:
@@ -62,22 +102,44 @@ class LaunchAdapter:
 
     @staticmethod
     def expand_one(arg: str, **kwargs: Any) -> str:
+        text = str(arg)
+        if "%" not in text:
+            # most options have nothing to substitute
+            return text
         try:
-            return str(arg) % kwargs
+            return text % kwargs
         except Exception:
             return arg
 
 
+def compile_options(options: list[str]) -> list[tuple[str, bool]]:
+    """Pair each option with whether it needs %-expansion"""
+    return [(text, "%" in text) for text in map(str, options)]
+
+
 class LaunchSpec:
-    def __init__(self, args: list[str], processes: int | None = None) -> None:
-        self.args = list(args)
+    def __init__(
+        self, args: list[str], processes: int | None = None, *, take_ownership: bool = False
+    ) -> None:
+        # take_ownership: the caller hands over ``args`` and will not touch it again
+        self.args = args if take_ownership else list(args)
         self.processes = processes
+        self._repr: tuple[tuple[str, ...], str] | None = None
+        self._program_index: tuple[tuple[str, ...], int] | None = None
 
     def __repr__(self) -> str:
-        return f"LaunchSpec({shlex.join(self.args)})"
+        # shlex.join quotes each argument: only redo it if the arguments have changed
+        key = tuple(self.args)
+        if self._repr is None or self._repr[0] != key:
+            self._repr = (key, f"LaunchSpec({shlex.join(key)})")
+        return self._repr[1]
 
     def partition(self) -> tuple[list[str], list[str]]:
-        i = argp(self.args)
+        # finding the program searches PATH: only redo it if the arguments have changed
+        key = tuple(self.args)
+        if self._program_index is None or self._program_index[0] != key:
+            self._program_index = (key, argp(self.args))
+        i = self._program_index[1]
         if i == -1:
             return [], list(self.args)
         else:
@@ -87,55 +149,65 @@ class LaunchSpec:
 class ArgumentParser:
     def __init__(self, *, numproc_flag: str | None = None) -> None:
         self.numproc_flag: str = numproc_flag or "-n"
+        self.numproc_flags = frozenset(("-n", "-np", self.numproc_flag))
+        # "-n=4" style options, built once rather than formatted for every argument
+        self.numproc_prefixes = tuple(f"{f}=" for f in self.numproc_flags)
 
     def parse_args(self, args: Sequence[str]) -> list[LaunchSpec]:
         """Inspect arguments to launch to infer number of processors requested"""
-        numproc_flags = {"-n", "-np"}
-        numproc_flags.add(self.numproc_flag)
+        numproc_flags = self.numproc_flags
         launchspecs: list[LaunchSpec] = []
         spec: list[str] = []
         processes: int | None = None
         command_seen: bool = False
-        iter_args = iter(args or [])
-        while True:
-            try:
-                arg = next(iter_args)
-            except StopIteration:
-                break
-            if shutil.which(arg):
+        args = args or []
+        pos, n = 0, len(args)
+        while pos < n:
+            arg = args[pos]
+            pos += 1
+            if not command_seen and is_program(arg):
                 command_seen = True
             if not command_seen:
                 if arg in numproc_flags:
-                    s = next(iter_args)
+                    if pos == n:
+                        raise ValueError(f"{arg}: expected one argument")
+                    s = args[pos]
+                    pos += 1
                     processes = int(s)
                     spec.extend([arg, s])
-                elif any(arg.startswith(f"{f}=") for f in numproc_flags):
-                    i = len(arg.partition("=")[0]) + 1
-                    processes = int(arg[i:])
+                elif arg.startswith(self.numproc_prefixes):
+                    processes = int(arg.partition("=")[2])
                     spec.append(arg)
                 else:
                     spec.append(arg)
             elif arg == ":":
                 # MPMD: end of this segment
-                launchspecs.append(LaunchSpec(spec, processes))
+                launchspecs.append(LaunchSpec(spec, processes, take_ownership=True))
                 spec = []
                 command_seen, processes = False, None
             else:
                 spec.append(arg)
 
         if spec:
-            launchspecs.append(LaunchSpec(spec, processes))
+            launchspecs.append(LaunchSpec(spec, processes, take_ownership=True))
 
         return launchspecs
 
 
 def argp(args: list[str]) -> int:
     for i, arg in enumerate(args):
-        if shutil.which(arg):
+        if is_program(arg):
             return i
     return -1
 
 
+def is_program(arg: str) -> bool:
+    # options and assignments are never the program: skip them without searching PATH
+    if arg.startswith("-") or "=" in arg:
+        return False
+    return which(arg) is not None
+
+
 def launch(args: list[str], **kwargs: Any) -> subprocess.CompletedProcess:
     from . import get_backend
 
@@ -2,35 +2,39 @@
 #
 # SPDX-License-Identifier: MIT
 
-import fnmatch
-import json
+import atexit
 import logging
 import os
+import select
 import shlex
-import shutil
+import signal
 import subprocess
+import sys
 import time
 import weakref
 from typing import Any
+from typing import Protocol
 from typing import TextIO
 from typing import Type
 
-import psutil
-
+from . import util
 from .backend import Backend
+from .discover import hostfile_spec
 from .hookspec import hookimpl
 from .jobspec import JobSpec
 from .launch import HPCLauncher
 from .mpi import MPIExecAdapter
 from .process import HPCProcess
 from .submit import HPCSubmissionManager
-from .util import set_executable
+from .util import which
+from .util import write_executable
 
 logger = logging.getLogger("hpc_connect.subprocess.backend")
 
 
 class LocalBackend(Backend):
     type = "local"
+    names = frozenset((type, "shell"))
 
     def __init__(self, cfg: dict[str, Any] | None = None) -> None:
         self._resource_specs: list[dict[str, Any]] | None = None
@@ -38,7 +42,7 @@ class LocalBackend(Backend):
 
     @classmethod
     def matches(cls, arg: str) -> bool:
-        return arg in (cls.type, "shell")
+        return arg in cls.names
 
     @property
     def resource_specs(self) -> list[dict]:
@@ -81,14 +85,11 @@ class LocalBackend(Backend):
 
     def discover(self) -> list[dict[str, Any]]:
         if file := os.getenv("HPC_CONNECT_HOSTFILE"):
-            with open(file) as fh:
-                data = json.load(fh)
             host: str = os.getenv("HPC_CONNECT_HOSTNAME") or os.uname().nodename
-            for pattern, rspec in data.items():
-                if fnmatch.fnmatch(host, pattern):
-                    return rspec
+            if rspec := hostfile_spec(file, host):
+                return rspec
         cfg: dict[str, Any] = self.config["config"]
-        cpu_count: int = cfg.get("cores_per_socket") or psutil.cpu_count() or 1
+        cpu_count: int = cfg.get("cores_per_socket") or util.cpu_count() or 1
         sockets_per_node: int = cfg.get("sockets_per_node") or 1
         node_count: int = cfg.get("nnode") or 1
 
@@ -100,7 +101,7 @@ class LocalBackend(Backend):
 class SubprocessAdapter:
     def __init__(self, config: dict[str, Any]):
         self.config = config
-        sh = shutil.which("sh")
+        sh = which("sh")
         if sh is None:
             raise ValueError("sh not found on PATH")
 
@@ -110,21 +111,15 @@ class SubprocessAdapter:
         return 1.0
 
     def prepare(self, spec: JobSpec) -> JobSpec:
-        sh = shutil.which("sh")
+        sh = which("sh")
         script = spec.workspace / f"{spec.name}.sh"
-        script.parent.mkdir(exist_ok=True)
-        with open(script, "w") as fh:
-            fh.write(f"#!{sh}\n")
-            for arg in spec.submit_args:
-                fh.write(f"#BASH {arg}\n")
-            for var, val in spec.env.items():
-                if val is None:
-                    fh.write(f"unset {var}\n")
-                else:
-                    fh.write(f'export {var}="{val}"\n')
-            for command in spec.commands:
-                fh.write(f"{command}\n")
-        set_executable(script)
+        lines: list[str] = [f"#!{sh}"]
+        lines.extend([f"#BASH {arg}" for arg in spec.submit_args])
+        for var, val in spec.env.items():
+            lines.append(f"unset {var}" if val is None else f'export {var}="{val}"')
+        lines.extend(spec.commands)
+        lines.append("")
+        write_executable(script, "\n".join(lines), mkdir=True)
         return spec.with_updates(commands=[f"{sh} {script}"])
 
     def submit(self, spec: JobSpec, exclusive: bool = True) -> "Subprocess":
@@ -133,12 +128,14 @@ class SubprocessAdapter:
 
 
 class Subprocess(HPCProcess):
+    # jobs run in their own session, out of reach of the terminal's SIGINT
+    cancel_on_interrupt = True
+    cheap_poll = True
+
     def __init__(
         self, args: list[str], output: str | None, error: str | None, emit_interval: float = 300.0
     ) -> None:
         stdout = streamify(output)
-        if stdout is not None:
-            weakref.finalize(stdout, stdout.close)
         stderr: TextIO | int | None
         if error is None:
             stderr = None
@@ -146,11 +143,41 @@ class Subprocess(HPCProcess):
             stderr = subprocess.STDOUT
         else:
             stderr = streamify(error)
-        if hasattr(stderr, "write"):
-            weakref.finalize(stderr, stderr.close)  # type: ignore
         self.submitted = self.started = time.time()
-        self.proc = subprocess.Popen(args, stdout=stdout, stderr=stderr)
+        try:
+            # The job leads its own process group so that cancel() can signal the whole tree at once.
+            # start_new_session, unlike a preexec_fn calling os.setsid, keeps Popen on its vfork
+            # path, so spawning a job does not copy this process's page tables.  Do not add a
+            # preexec_fn here
+            self.proc = subprocess.Popen(
+                args, stdout=stdout, stderr=stderr, start_new_session=hasattr(os, "killpg")
+            )
+        finally:
+            close_streams(stdout, stderr)
+        if hasattr(os, "killpg"):
+            live_job_groups[self.proc.pid] = self.proc
         self.jobid = str(self.proc.pid)
+        self.pidfd: int | None = None
+        try:
+            # a pidfd becomes readable when the process exits, so waiters need not poll for it
+            self.pidfd = os.pidfd_open(self.proc.pid)
+        except (AttributeError, OSError):
+            pass
+        else:
+            self._close_pidfd = weakref.finalize(self, os.close, self.pidfd)
+            # poll rather than select: select cannot watch descriptors numbered FD_SETSIZE or
+            # higher, which jobs reach on hosts with a raised RLIMIT_NOFILE
+            self._pidfd_poller = select.poll()
+            self._pidfd_poller.register(self.pidfd, select.POLLIN)
+        self.kqueue: ExitQueue | None = None
+        if self.pidfd is None and (
+            sys.platform == "darwin"
+            or sys.platform.startswith("freebsd")
+            or sys.platform.startswith("openbsd")
+            or sys.platform.startswith("netbsd")
+        ):
+            # BSD and macOS have no pidfd, but a kqueue can report the process's exit instead
+            self.kqueue = exit_kqueue(self.proc.pid)
         self.last_debug_emit: float = -1
         self.emit_interval: float = emit_interval
 
@@ -164,39 +191,175 @@ class Subprocess(HPCProcess):
 
     def poll(self) -> int | None:
         rc = self.proc.poll()
-        now = time.monotonic()
-        if now - self.last_debug_emit >= self.emit_interval:
-            logger.debug(f"Polling running job with pid {self.proc.pid}")
-            self.last_debug_emit = now
+        if rc is not None:
+            live_job_groups.pop(self.proc.pid, None)
+        if rc is not None and self.pidfd is not None:
+            self._pidfd_poller.unregister(self.pidfd)
+            self._close_pidfd()
+            self.pidfd = None
+        if rc is not None and self.kqueue is not None:
+            self.kqueue.close()
+            self.kqueue = None
+        if logger.isEnabledFor(logging.DEBUG):
+            # only read the clock when there is a debug message to throttle
+            now = time.monotonic()
+            if now - self.last_debug_emit >= self.emit_interval:
+                logger.debug(f"Polling running job with pid {self.proc.pid}")
+                self.last_debug_emit = now
         return rc
 
+    def wait(self, timeout: float) -> None:
+        if self.pidfd is not None:
+            self._pidfd_poller.poll(timeout * 1000)
+        elif self.kqueue is not None:
+            self.kqueue.control(None, 1, timeout)
+        else:
+            time.sleep(timeout)
+
     def cancel(self) -> None:
-        """Kill a process tree (including grandchildren)"""
         logger.warning(f"cancelling shell batch with pid {self.proc.pid}")
+        if hasattr(os, "killpg"):
+            kill_process_group(self.proc)
+            live_job_groups.pop(self.proc.pid, None)
+        else:
+            kill_process_tree(self.proc.pid)
+
+
+# Process groups of the local jobs still running, by leader pid.  The jobs are started in their own
+# sessions, so they no longer die with this process's foreground group: whatever is left of them
+# when the interpreter dies of an uncaught exception or Ctrl-C is killed then.  Jobs still running
+# at a normal exit are left running, as they always were
+live_job_groups: dict[int, subprocess.Popen] = {}
+
+
+@atexit.register
+def kill_live_job_groups_on_error() -> None:
+    # sys.last_type is set once the interpreter has reported an uncaught exception, which includes
+    # KeyboardInterrupt, and before exit handlers run
+    if getattr(sys, "last_type", None) is not None:
+        kill_live_job_groups()
+
+
+def kill_live_job_groups(timeout: float = 2.0) -> None:
+    procs = list(live_job_groups.values())
+    live_job_groups.clear()
+    for proc in procs:
         try:
-            parent = psutil.Process(self.proc.pid)
-        except psutil.NoSuchProcess:
-            return
-        children = parent.children(recursive=True)
-        children.append(parent)
-        for p in children:
-            try:
-                p.terminate()
-            except Exception:  # nosec B110
-                pass
-        _, alive = psutil.wait_procs(children)
-        for p in alive:
-            try:
-                p.kill()
-            except Exception:  # nosec B110
-                pass
+            os.killpg(proc.pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+    deadline = time.monotonic() + timeout
+    for proc in procs:
+        try:
+            proc.wait(timeout=max(deadline - time.monotonic(), 0.0))
+        except subprocess.TimeoutExpired:
+            pass
+        try:
+            os.killpg(proc.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+
+
+class ExitQueue(Protocol):
+    """The part of ``select.kqueue`` that ``Subprocess`` uses, so that it can be named on platforms
+    without kqueue"""
+
+    def control(self, changelist: None, maxevents: int, timeout: float, /) -> Any: ...
+
+    def close(self) -> None: ...
+
+
+if (
+    sys.platform == "darwin"
+    or sys.platform.startswith("freebsd")
+    or sys.platform.startswith("openbsd")
+    or sys.platform.startswith("netbsd")
+):
+
+    def exit_kqueue(pid: int) -> ExitQueue | None:
+        """A kqueue that becomes ready when process ``pid`` exits, or None if one cannot be made"""
+        kq = select.kqueue()
+        event = select.kevent(
+            pid, filter=select.KQ_FILTER_PROC, flags=select.KQ_EV_ADD, fflags=select.KQ_NOTE_EXIT
+        )
+        try:
+            kq.control([event], 0, 0)
+        except OSError:
+            # most likely the process has already exited: there is nothing left to wait for
+            kq.close()
+            return None
+        return kq
+
+
+def kill_process_group(proc: subprocess.Popen, timeout: float = 5.0) -> None:
+    """Terminate the process group led by ``proc``, then kill whatever is left of it"""
+    try:
+        os.killpg(proc.pid, signal.SIGTERM)
+    except ProcessLookupError:
+        return
+    try:
+        proc.wait(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        pass
+    try:
+        os.killpg(proc.pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+
+
+def kill_process_tree(pid: int) -> None:
+    """Kill a process tree (including grandchildren)"""
+    import psutil
+
+    try:
+        parent = psutil.Process(pid)
+    except psutil.NoSuchProcess:
+        return
+    children = parent.children(recursive=True)
+    children.append(parent)
+    for p in children:
+        try:
+            p.terminate()
+        except Exception:  # nosec B110
+            pass
+    _, alive = psutil.wait_procs(children)
+    for p in alive:
+        try:
+            p.kill()
+        except Exception:  # nosec B110
+            pass
+
+
+# Output directories known to exist, so that jobs writing to the same directory do not each walk
+# its parents with os.makedirs
+_output_dirs: set[str] = set()
 
 
 def streamify(arg: str | None) -> TextIO | None:
     if arg is None:
         return None
-    os.makedirs(os.path.dirname(arg), exist_ok=True)
-    return open(arg, mode="w")
+    dirname = os.path.dirname(arg)
+    flags = os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, "O_CLOEXEC", 0)
+    if dirname and dirname not in _output_dirs:
+        os.makedirs(dirname, exist_ok=True)
+        _output_dirs.add(dirname)
+    try:
+        fd = os.open(arg, flags, 0o666)
+    except FileNotFoundError:
+        if not dirname:
+            raise
+        # the directory was removed since it was last seen
+        os.makedirs(dirname, exist_ok=True)
+        fd = os.open(arg, flags, 0o666)
+    return os.fdopen(fd, "w")
+
+
+def close_streams(*streams: TextIO | int | None) -> None:
+    """Close the parent's copies of the child's output streams.  The child process holds its own
+    duplicates of the descriptors, so there is no need to keep them open for its lifetime"""
+    for stream in streams:
+        if hasattr(stream, "close"):
+            stream.close()  # type: ignore
 
 
 @hookimpl
@@ -4,7 +4,6 @@
 
 import logging
 import os
-import shutil
 
 from .launch import LaunchAdapter
 from .launch import LaunchSpec
@@ -16,50 +15,45 @@ class MPIExecAdapter(LaunchAdapter):
     name: str = "mpiexec"
 
     def join_specs(self, specs: list["LaunchSpec"]) -> list[str]:
-        name = self.config.get("exec") or "mpiexec"
-        exec = shutil.which(name)
-        if exec is None:
-            raise ValueError(f"{name}: executable not found on PATH")
+        exec = self.executable
         if len(specs) > 1:
             return self._join_mpmd(exec, specs)
         return self._join_spmd(exec, specs[0])
 
     def _join_spmd(self, exec: str, spec: LaunchSpec) -> list[str]:
-        argv = [os.fsdecode(exec)]
         view = self.backend.resource_view(ranks=spec.processes)
-        for opt in self.config["default_options"]:
-            argv.append(self.expand_one(opt, **view))
         launch_opts, program_opts = spec.partition()
-        for opt in launch_opts:
-            argv.append(self.expand_one(opt, **view))
-        for opt in self.config["pre_options"]:
-            argv.append(self.expand_one(opt, **view))
-        for opt in program_opts:
-            argv.append(self.expand_one(opt, **view))
-        return argv
+        return [
+            os.fsdecode(exec),
+            *self.expand_options("default_options", view),
+            *self.expand_args(launch_opts, view),
+            *self.expand_options("pre_options", view),
+            *self.expand_args(program_opts, view),
+        ]
 
     def _join_mpmd(self, exec: str, specs: list["LaunchSpec"]) -> list[str]:
         argv = [os.fsdecode(exec)]
         np = sum(spec.processes for spec in specs if spec.processes)
-        argv.extend(self.config["mpmd"]["global_options"])
-        argv.extend(self.config["default_options"])
         view = self.backend.resource_view(ranks=np)
-        for opt in self.config["mpmd"]["global_options"]:
-            argv.append(self.expand_one(opt, **view))
-        for opt in self.config["default_options"]:
-            argv.append(self.expand_one(opt, **view))
+        argv.extend(self.expand_options("global_options", view))
+        argv.extend(self.expand_options("default_options", view))
 
+        # specs commonly share a process count: build each distinct resource view, and expand
+        # the configured options against it, once
+        expanded: dict[int, tuple[dict[str, int], list[str], list[str]]] = {}
+        resource_view, expand_options = self.backend.resource_view, self.expand_options
         for spec in specs:
-            view = self.backend.resource_view(ranks=spec.processes or 1)
-            for opt in self.config["mpmd"]["local_options"]:
-                argv.append(self.expand_one(opt, **view))
+            p = spec.processes or 1
+            if p not in expanded:
+                view = resource_view(ranks=p)
+                local_opts = expand_options("local_options", view)
+                expanded[p] = (view, local_opts, expand_options("pre_options", view))
+            view, local_opts, pre_opts = expanded[p]
+            argv.extend(local_opts)
             launch_opts, program_opts = spec.partition()
-            for opt in launch_opts:
-                argv.append(self.expand_one(opt, **view))
-            for opt in self.config["pre_options"]:
-                argv.append(self.expand_one(opt, **view))
-            for opt in program_opts:
-                argv.append(self.expand_one(opt, **view))
+            argv.extend(self.expand_args(launch_opts, view))
+            argv.extend(pre_opts)
+            argv.extend(self.expand_args(program_opts, view))
             argv.append(":")
         if argv[-1] == ":":
             argv.pop()
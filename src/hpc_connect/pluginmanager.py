@@ -1,29 +1,56 @@
 # Copyright NTESS. See COPYRIGHT file for details.
 #
 # SPDX-License-Identifier: MIT
+import os
 import sys
 import warnings
+from typing import TYPE_CHECKING
+from typing import Any
 
 import pluggy
 
 from . import hookspec
 from . import local
 
+if TYPE_CHECKING:
+    from .backend import Backend
+
 warnings.simplefilter("once", DeprecationWarning)
 
 
 class HPCConnectPluginManager(pluggy.PluginManager):
     def __init__(self):
+        # hpc_connect_backend() results, dropped whenever the set of plugins changes
+        self._backend_types: list[type["Backend"]] | None = None
         super().__init__(hookspec.project_name)
         self.add_hookspecs(hookspec)
         self.register(local)
-        self.load_setuptools_entrypoints(hookspec.project_name)
+        if os.getenv("HPC_CONNECT_NO_ENTRYPOINTS", "no").lower() not in ("yes", "true", "1", "on"):
+            # Scanning entry points reads the metadata of every installed distribution.  With
+            # HPC_CONNECT_NO_ENTRYPOINTS set, plugins are loaded explicitly with consider_plugin
+            self.load_setuptools_entrypoints(hookspec.project_name)
+
+    def register(self, plugin: Any, name: str | None = None) -> str | None:
+        self._backend_types = None
+        return super().register(plugin, name=name)
+
+    def unregister(self, plugin: Any = None, name: str | None = None) -> Any:
+        self._backend_types = None
+        return super().unregister(plugin=plugin, name=name)
+
+    def backend_types(self) -> list[type["Backend"]]:
+        """The backends provided by registered plugins"""
+        if self._backend_types is None:
+            types = self.hook.hpc_connect_backend()
+            self._backend_types = [t for t in types if t is not None]
+        return list(self._backend_types)
 
     def consider_plugin(self, name: str) -> None:
         assert isinstance(name, str), f"module name as text required, got {name!r}"
         if name.startswith("no:"):
-            self.unregister(name=name[3:])
-            self.set_blocked(name[3:])
+            blocked = name.removeprefix("no:")
+            self.unregister(name=blocked)
+            self.set_blocked(blocked)
         else:
             self.import_plugin(name)
 
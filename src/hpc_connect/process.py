@@ -1,37 +1,21 @@
 import abc
+import time
 
 
 class HPCProcess(abc.ABC):
-    _jobid: str = "unset"
-    _submitted: float = -1.0
-    _started: float = -1.0
+    # Plain attributes: the process monitor reads these often and they need no validation
+    jobid: str = "unset"
+    submitted: float = -1.0
+    started: float = -1.0
+    # Jobs that the user would expect to stop with Ctrl-C, as a foreground command would.  Futures
+    # cancel these when interrupted while waiting on them
+    cancel_on_interrupt: bool = False
+    # poll() answers without running a scheduler command (e.g. qstat), so futures may poll sooner
+    # than the configured interval while a job is young.  Otherwise the interval is the floor
+    cheap_poll: bool = False
 
     def __init__(self, args: list[str], output: str | None, error: str | None) -> None: ...
 
-    @property
-    def submitted(self) -> float:
-        return self._submitted
-
-    @submitted.setter
-    def submitted(self, arg: float) -> None:
-        self._submitted = arg
-
-    @property
-    def started(self) -> float:
-        return self._started
-
-    @started.setter
-    def started(self, arg: float) -> None:
-        self._started = arg
-
-    @property
-    def jobid(self) -> str:
-        return self._jobid
-
-    @jobid.setter
-    def jobid(self, arg: str) -> None:
-        self._jobid = arg
-
     @property
     @abc.abstractmethod
     def returncode(self) -> int | None: ...
@@ -45,3 +29,18 @@ class HPCProcess(abc.ABC):
 
     @abc.abstractmethod
     def cancel(self) -> None: ...
+
+    @classmethod
+    def cancel_many(cls, procs: list["HPCProcess"]) -> None:
+        """Cancel several jobs of this type.  Backends that can cancel many jobs with one scheduler
+        command override this"""
+        for proc in procs:
+            try:
+                proc.cancel()
+            except Exception as e:
+                print(f"Warning: failed to cancel job {proc.jobid}: {e}")
+
+    def wait(self, timeout: float) -> None:
+        """Block until the job may have finished or ``timeout`` seconds pass.  Backends that can
+        be notified when their job exits override this to return early"""
+        time.sleep(timeout)
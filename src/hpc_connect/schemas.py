@@ -3,6 +3,7 @@
 # SPDX-License-Identifier: MIT
 
 import copy
+import json
 import shlex
 from typing import Any
 
@@ -12,11 +13,16 @@ from schema import Or
 from schema import Schema as BaseSchema
 from schema import Use
 
+_SHELL_QUOTES = frozenset("\"'\\")
+
 
 def flag_splitter(arg: list[str] | str) -> list[str]:
     if isinstance(arg, str):
+        if arg.isascii() and arg.isprintable() and not _SHELL_QUOTES.intersection(arg):
+            # nothing for shlex to interpret: splitting on the spaces gives the same words
+            return arg.split()
         return shlex.split(arg)
-    elif not isinstance(arg, list) and not all(isinstance(_, str) for _ in arg):
+    elif not isinstance(arg, list) or not all(isinstance(_, str) for _ in arg):
         raise ValueError("expected list[str]")
     return arg
 
@@ -42,11 +48,27 @@ class Schema(BaseSchema):
                         data[raw_key] = copy.deepcopy(factory())
         return super().validate(data, *args, **kwargs)
 
+    def validate_memoized(self, data: Any) -> Any:
+        """``validate(data)``, memoized on the JSON form of ``data``.  Backends and launchers are
+        built from the same few configurations over and over.  The caller owns the returned copy"""
+        try:
+            key = json.dumps(data, sort_keys=True)
+        except (TypeError, ValueError):
+            return self.validate(copy.deepcopy(data))
+        memo: dict[str, Any] = self.__dict__.setdefault("_memo", {})
+        if key not in memo:
+            if len(memo) >= 64:
+                memo.clear()
+            # validate a private copy: validators hand list inputs back as is, and the caller may
+            # go on to modify them
+            memo[key] = self.validate(copy.deepcopy(data))
+        return copy.deepcopy(memo[key])
+
 
 list_of_str: And = And(lambda x: isinstance(x, list), lambda x: all(isinstance(_, str) for _ in x))
 dict_str_str: And = And(
     lambda x: isinstance(x, dict),
-    lambda x: all(isinstance(_, str) for k, v in x.items() for _ in (k, v)),
+    lambda x: all(isinstance(k, str) and isinstance(v, str) for k, v in x.items()),
 )
 
 
@@ -1,9 +1,12 @@
 # Copyright NTESS. See COPYRIGHT file for details.
 #
 # SPDX-License-Identifier: MIT
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable
 from typing import Protocol
 
 from .futures import Future
+from .futures import cancel_futures
 from .jobspec import JobSpec
 from .process import HPCProcess
 
@@ -24,3 +27,27 @@ class HPCSubmissionManager:
     def submit(self, spec: JobSpec, exclusive: bool = True) -> Future:
         proc = self.adapter.submit(spec, exclusive=exclusive)
         return Future(proc, polling_interval=self.adapter.polling_interval() or 1.0)
+
+    def submit_many(
+        self, specs: Iterable[JobSpec], exclusive: bool = True, max_workers: int = 16
+    ) -> list[Future]:
+        """Submit independent jobs concurrently.  Submission is dominated by waiting on the
+        scheduler's submit command, so the submissions overlap in threads.  ``max_workers`` bounds
+        the number in flight, e.g. to stay under per-user submission limits."""
+        specs = list(specs)
+        if len(specs) <= 1:
+            return [self.submit(spec, exclusive=exclusive) for spec in specs]
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(specs))) as ex:
+            pending = [ex.submit(self.submit, spec, exclusive=exclusive) for spec in specs]
+        submitted: list[Future] = []
+        errors: list[BaseException] = []
+        for p in pending:
+            if (error := p.exception()) is not None:
+                errors.append(error)
+            else:
+                submitted.append(p.result())
+        if errors:
+            # Don't leave the jobs that did get submitted running with no handle to them
+            cancel_futures(submitted)
+            raise errors[0]
+        return submitted
@@ -2,17 +2,17 @@
 #
 # SPDX-License-Identifier: MIT
 
+import functools
 import json
 import json.decoder
 import os
 import re
+import shutil
 import stat
 from pathlib import Path
 from typing import Any
 from typing import Callable
 
-from psutil import cpu_count
-
 from .tengine import make_template_env
 from .time import hhmmss
 from .time import time_in_seconds
@@ -23,12 +23,61 @@ __all__ = [
     "time_in_seconds",
     "cpu_count",
     "set_executable",
+    "write_executable",
     "partition",
     "sanitize_path",
+    "which",
     "safe_loads",
 ]
 
 
+@functools.lru_cache(maxsize=2)
+def cpu_count(logical: bool = True) -> int | None:
+    """Return the number of CPUs in the system.  psutil is imported, and asked, on first use"""
+    import psutil
+
+    return psutil.cpu_count(logical=logical)
+
+
+def which(name: str) -> str | None:
+    """Memoized ``shutil.which``.  Results are keyed on ``$PATH`` so that changes to it are seen
+    without clearing the cache (``which.cache_clear()`` drops every entry).  Only programs that
+    were found are remembered: one installed after a failed lookup is found by the next"""
+    if os.sep in name:
+        # relative paths are resolved against the working directory, which may change
+        return shutil.which(name)
+    key = (name, os.environ.get("PATH"))
+    if (file := _which_found.get(key)) is None:
+        if (file := _which_on_path(*key)) is not None:
+            if len(_which_found) >= 4096:
+                _which_found.clear()
+            _which_found[key] = file
+    return file
+
+
+_which_found: dict[tuple[str, str | None], str] = {}
+
+
+def _which_on_path(name: str, path: str | None) -> str | None:
+    if os.name != "posix" or path is None:
+        # leave PATHEXT and the default search path to shutil
+        return shutil.which(name, path=path)
+    for dirname in _path_dirs(path):
+        file = os.path.join(dirname, name)
+        if os.access(file, os.X_OK) and not os.path.isdir(file):
+            return file
+    return None
+
+
+@functools.lru_cache(maxsize=8)
+def _path_dirs(path: str) -> tuple[str, ...]:
+    """``$PATH`` split once per value, rather than by every lookup that misses the cache"""
+    return tuple(dict.fromkeys(dirname for dirname in path.split(os.pathsep) if dirname))
+
+
+which.cache_clear = _which_found.clear  # type: ignore[attr-defined]
+
+
 def set_executable(path: str | Path) -> None:
     """Set executable bits on ``path``"""
     mode = os.stat(path).st_mode
@@ -41,6 +90,47 @@ def set_executable(path: str | Path) -> None:
     os.chmod(path, mode)
 
 
+def write_executable(path: str | Path, text: str, *, mkdir: bool = False) -> None:
+    """Write ``text`` to ``path``, creating it with executable permissions (subject to the umask).
+    Avoids re-opening the file to ``chmod`` it after it is written.  With ``mkdir``, the parent
+    directory is created if it is missing -- only once the open has failed, so that writing into an
+    existing directory costs no extra system calls.  Scripts are small and written in one go, so
+    this skips the buffered text layer and hands the bytes to ``os.write``"""
+    data = text.encode()
+    fd = _create_executable(path, mkdir=mkdir)
+    try:
+        view = memoryview(data)
+        while view:
+            view = view[os.write(fd, view) :]
+    finally:
+        os.close(fd)
+
+
+def _create_executable(path: str | Path, *, mkdir: bool) -> int:
+    flags = os.O_WRONLY | os.O_CREAT | os.O_TRUNC | os.O_CLOEXEC
+    try:
+        fd = os.open(path, flags, 0o755)
+    except FileNotFoundError:
+        if not mkdir:
+            raise
+        try:
+            os.mkdir(os.path.dirname(os.path.abspath(path)))
+        except FileExistsError:
+            pass  # created by a concurrent submission
+        fd = os.open(path, flags, 0o755)
+    # The mode passed to open only applies to new files: a script being overwritten keeps its old
+    # mode, so set the executable bits as set_executable would
+    mode = os.fstat(fd).st_mode
+    exec_mode = mode | (mode & (stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH)) >> 2
+    if exec_mode != mode:
+        try:
+            os.fchmod(fd, stat.S_IMODE(exec_mode))
+        except BaseException:
+            os.close(fd)
+            raise
+    return fd
+
+
 def partition(arg: list[Any], predicate: Callable) -> tuple[list[Any], list[Any]]:
     a: list[Any] = []
     b: list[Any] = []
@@ -52,10 +142,16 @@ def partition(arg: list[Any], predicate: Callable) -> tuple[list[Any], list[Any]
     return a, b
 
 
+_ILLEGAL_PATH_CHARS_RE = re.compile(r"[^\w_. -]")
+
+
 def sanitize_path(path: str) -> str:
     """Remove illegal file characters from ``path``"""
     dirname, basename = os.path.split(path)
-    basename = re.sub(r"[^\w_. -]", "_", basename).strip("_")
+    if _ILLEGAL_PATH_CHARS_RE.search(basename):
+        basename = _ILLEGAL_PATH_CHARS_RE.sub("_", basename)
+    if basename.startswith("_") or basename.endswith("_"):
+        basename = basename.strip("_")
     return os.path.join(dirname, basename)
 
 
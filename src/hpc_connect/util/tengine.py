@@ -2,18 +2,45 @@
 #
 # SPDX-License-Identifier: MIT
 
-import importlib.resources
-
-import jinja2
+import functools
+from typing import TYPE_CHECKING
 
 from .time import hhmmss
 
+if TYPE_CHECKING:
+    import jinja2
 
-def make_template_env(*dirs: str) -> jinja2.Environment:
-    """Returns a configured environment for template rendering."""
-    template_dirs: set[str] = {str(importlib.resources.files("hpc_connect").joinpath("templates"))}
-    template_dirs.update(dirs)
-    loader = jinja2.FileSystemLoader(tuple(template_dirs))
+
+def make_template_env(*dirs: str) -> "jinja2.Environment":
+    """Returns a configured environment for template rendering.  Each caller gets its own
+    environment to add globals and filters to, but callers asking for the same ``dirs`` share the
+    loader and the compiled templates."""
+    import jinja2
+
+    loader, bytecode_cache = _template_loader(*dirs)
     env = jinja2.Environment(loader=loader, trim_blocks=True, lstrip_blocks=True)  # nosec B701
+    env.bytecode_cache = bytecode_cache
     env.globals["hhmmss"] = hhmmss
     return env
+
+
+@functools.lru_cache(maxsize=16)
+def _template_loader(*dirs: str) -> tuple["jinja2.BaseLoader", "jinja2.BytecodeCache"]:
+    import importlib.resources
+
+    import jinja2
+
+    class MemoryBytecodeCache(jinja2.BytecodeCache):
+        def __init__(self) -> None:
+            self.data: dict[str, bytes] = {}
+
+        def load_bytecode(self, bucket: jinja2.bccache.Bucket) -> None:
+            if (code := self.data.get(bucket.key)) is not None:
+                bucket.bytecode_from_string(code)
+
+        def dump_bytecode(self, bucket: jinja2.bccache.Bucket) -> None:
+            self.data[bucket.key] = bucket.bytecode_to_string()
+
+    template_dirs: set[str] = {str(importlib.resources.files("hpc_connect").joinpath("templates"))}
+    template_dirs.update(dirs)
+    return jinja2.FileSystemLoader(tuple(template_dirs)), MemoryBytecodeCache()
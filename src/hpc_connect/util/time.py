@@ -2,16 +2,18 @@
 #
 # SPDX-License-Identifier: MIT
 
+import functools
 import re
 from datetime import datetime
 from datetime import timedelta
 from datetime import timezone
 
 
+@functools.lru_cache(maxsize=64)
 def hhmmss(seconds: float | None, threshold: float = 2.0) -> str:
+    """Format ``seconds`` as HH:MM:SS.  Memoized: jobs of a batch commonly share a time limit"""
     if seconds is None:
         return "--:--:--"
-    t = datetime.fromtimestamp(seconds)
     utc = datetime.fromtimestamp(seconds, timezone.utc)
     if seconds < threshold:
         return datetime.strftime(utc, "%H:%M:%S.%f")[:-4]
@@ -55,6 +57,9 @@ class Duration:
     }
 
     _re = re.compile(r"([\d\.]+)([a-zµμ]+)")
+    _number_re = re.compile(r"(?xm)(?:\s|^)([-+]*(?:\d+\.\d*|\.?\d+)(?:[eE][-+]?\d+)?)(?=\s|$)")
+    _hhmmss_re = re.compile(r"^\d{1,2}:\d{1,2}:\d{1,2}(\.\d+)?$")
+    _mmss_re = re.compile(r"^\d{1,2}:\d{1,2}(\.\d+)?$")
 
     @staticmethod
     def from_str(duration: str) -> timedelta:
@@ -72,15 +77,15 @@ class Duration:
             sign = -1 if duration[0] == "-" else 1
             duration = duration[1:]
 
-        if re.search(r"(?xm)(?:\s|^)([-+]*(?:\d+\.\d*|\.?\d+)(?:[eE][-+]?\d+)?)(?=\s|$)", duration):
+        if Duration._number_re.search(duration):
             return timedelta(seconds=sign * float(duration))
-        elif re.search(r"^\d{1,2}:\d{1,2}:\d{1,2}(\.\d+)?$", duration):
+        elif Duration._hhmmss_re.search(duration):
             hours, minutes, seconds = [float(_) for _ in duration.split(":")]
             units = Duration.units
             microseconds = hours * units["h"] + minutes * units["m"] + seconds * units["s"]
             print(microseconds / Duration._microsecond_size)
             return timedelta(microseconds=sign * microseconds / Duration._microsecond_size)
-        elif re.search(r"^\d{1,2}:\d{1,2}(\.\d+)?$", duration):
+        elif Duration._mmss_re.search(duration):
             minutes, seconds = [float(_) for _ in duration.split(":")]
             microseconds = minutes * 60.0 + seconds * 1.0
             return timedelta(microseconds=sign * microseconds / Duration._microsecond_size)
@@ -4,11 +4,8 @@
 
 import logging
 import math
-import multiprocessing
-import multiprocessing.synchronize
 import os
-import shutil
-import time
+import threading
 from typing import Any
 
 import flux  # type: ignore
@@ -19,7 +16,8 @@ from flux.job import JobspecV1  # type: ignore
 
 import hpc_connect
 from hpc_connect.mpi import MPIExecAdapter
-from hpc_connect.util import set_executable
+from hpc_connect.util import which
+from hpc_connect.util import write_executable
 
 from .discover import read_resource_info
 from .process import FluxProcess
@@ -87,7 +85,8 @@ class FluxBackend(hpc_connect.Backend):
 
 
 class FluxAdapter:
-    lock: multiprocessing.synchronize.RLock = multiprocessing.RLock()
+    # submissions and shutdown only race between threads of this process
+    lock: threading.RLock = threading.RLock()
 
     def __init__(self, backend: FluxBackend, config: dict[str, Any]) -> None:
         self.config = config
@@ -105,33 +104,26 @@ class FluxAdapter:
 
     def prepare(self, spec: hpc_connect.JobSpec, exclusive: bool = True) -> Jobspec:
         duration = int(spec.time_limit + 60)
-        sh = shutil.which("sh")
+        sh = which("sh")
         script = spec.workspace / f"{spec.name}.sh"
-        script.parent.mkdir(exist_ok=True)
         alloc = self.get_alloc_settings(spec.cpus, spec.gpus, spec.nodes)
-        with open(script, "w") as fh:
-            fh.write(f"#!{sh}\n")
-            fh.write(f"#flux: --nodes={spec.nodes}\n")
-            fh.write(f"#flux: --nslots={alloc['num_slots']}\n")
-            fh.write(f"#flux: --cores-per-slot={alloc['cores_per_slot']}\n")
-            fh.write(f"#flux: --gpus-per-slot={alloc['gpus_per_slot']}\n")
-            fh.write(f"#flux: --time-limit={duration}s\n")
-            if spec.output:
-                fh.write(f"#flux: --output={spec.output}\n")
-            if spec.error:
-                fh.write(f"#flux: --error={spec.output}\n")
-            for arg in self.config["default_options"]:
-                fh.write(f"#flux: {arg}\n")
-            for arg in spec.submit_args:
-                fh.write(f"#flux: {arg}\n")
-            for var, val in spec.env.items():
-                if val is None:
-                    fh.write(f"unset {var}\n")
-                else:
-                    fh.write(f'export {var}="{val}"\n')
-            for command in spec.commands:
-                fh.write(f"{command}\n")
-        set_executable(script)
+        lines: list[str] = [f"#!{sh}"]
+        lines.append(f"#flux: --nodes={spec.nodes}")
+        lines.append(f"#flux: --nslots={alloc['num_slots']}")
+        lines.append(f"#flux: --cores-per-slot={alloc['cores_per_slot']}")
+        lines.append(f"#flux: --gpus-per-slot={alloc['gpus_per_slot']}")
+        lines.append(f"#flux: --time-limit={duration}s")
+        if spec.output:
+            lines.append(f"#flux: --output={spec.output}")
+        if spec.error:
+            lines.append(f"#flux: --error={spec.error}")
+        lines.extend([f"#flux: {arg}" for arg in self.config["default_options"]])
+        lines.extend([f"#flux: {arg}" for arg in spec.submit_args])
+        for var, val in spec.env.items():
+            lines.append(f"unset {var}" if val is None else f'export {var}="{val}"')
+        lines.extend(spec.commands)
+        lines.append("")
+        write_executable(script, "\n".join(lines), mkdir=True)
         kwds: dict[str, Any] = {"command": [str(script)], "exclusive": exclusive}
         kwds.update(alloc)
         jobspec = JobspecV1.from_nest_command(**kwds)
@@ -179,7 +171,6 @@ class FluxAdapter:
     def shutdown(self):
         with self.lock:
             if self.backend.flux:
-                time.sleep(0.25)
                 if flux.job:
                     jobs = flux.job.JobList(self.backend.fh, filters=["running", "pending"]).jobs()
                     if jobs:
@@ -3,8 +3,7 @@
 # SPDX-License-Identifier: MIT
 
 import logging
-import multiprocessing
-import multiprocessing.synchronize
+import threading
 import time
 from concurrent.futures import CancelledError
 
@@ -19,6 +18,8 @@ logger = logging.getLogger("hpc_connect.flux.submit")
 
 class FluxProcess(hpc_connect.HPCProcess):
     JOB_TIMEOUT_CODE = 66
+    # the executor future reports the job's state; polling does not call flux
+    cheap_poll = True
 
     def __init__(self, name: str, future: FluxExecutorFuture, fh: Flux) -> None:
         self.fh = fh
@@ -76,13 +77,17 @@ class FluxProcess(hpc_connect.HPCProcess):
 
 
 class FluxMultiProcess(hpc_connect.HPCProcess):
+    cheap_poll = True
+
     def __init__(
         self,
-        lock: multiprocessing.synchronize.RLock,
+        lock: threading.RLock,
         procs: list[FluxProcess] | None = None,
     ) -> None:
         self.lock = lock
         self.procs = procs or []
+        # the jobs not yet seen to finish: a finished job is not polled again
+        self.active: list[FluxProcess] = list(self.procs)
 
     @property
     def returncode(self) -> int | None:
@@ -97,9 +102,13 @@ class FluxMultiProcess(hpc_connect.HPCProcess):
 
     def append(self, proc: FluxProcess) -> None:
         self.procs.append(proc)
+        self.active.append(proc)
 
     def pop(self, /, i: int = -1) -> FluxProcess:
-        return self.procs.pop(i)
+        proc = self.procs.pop(i)
+        if proc in self.active:
+            self.active.remove(proc)
+        return proc
 
     def cancel(self) -> None:
         with self.lock:
@@ -107,9 +116,7 @@ class FluxMultiProcess(hpc_connect.HPCProcess):
                 proc.cancel()
 
     def poll(self) -> int | None:
-        stat: list[int | None] = []
-        for proc in self.procs:
-            stat.append(proc.poll())
-        if any([_ is None for _ in stat]):
+        self.active = [proc for proc in self.active if proc.poll() is None]
+        if self.active:
             return None
-        return max(stat)  # type: ignore
+        return max((proc.returncode for proc in self.procs), default=None)  # type: ignore
@@ -3,12 +3,13 @@
 # SPDX-License-Identifier: MIT
 
 import logging
-import shutil
+from pathlib import Path
 from typing import Any
 
 import hpc_connect
 from hpc_connect.mpi import MPIExecAdapter
-from hpc_connect.util import set_executable
+from hpc_connect.util import which
+from hpc_connect.util import write_executable
 from hpc_connect.util.time import hhmmss
 
 from .discover import read_pbsnodes
@@ -21,13 +22,13 @@ class PBSBackend(hpc_connect.Backend):
     type = "pbs"
 
     def __init__(self, cfg: dict[str, Any] | None = None) -> None:
-        qsub = shutil.which("qsub")
+        qsub = which("qsub")
         if qsub is None:
             raise ValueError("qsub not found on PATH")
-        qstat = shutil.which("qstat")
+        qstat = which("qstat")
         if qstat is None:
             raise ValueError("qstat not found on PATH")
-        qdel = shutil.which("qdel")
+        qdel = which("qdel")
         if qdel is None:
             raise ValueError("qdel not found on PATH")
         self._resource_specs: list[dict] | None = None
@@ -82,7 +83,7 @@ class PBSBackend(hpc_connect.Backend):
 
 class QsubAdapter:
     def __init__(self, backend: PBSBackend, config: dict[str, Any]) -> None:
-        qsub = shutil.which("qsub")
+        qsub = which("qsub")
         if qsub is None:
             raise ValueError("qsub not found on PATH")
         self.config = config
@@ -94,37 +95,38 @@ class QsubAdapter:
         return 5.0
 
     def prepare(self, spec: hpc_connect.JobSpec) -> hpc_connect.JobSpec:
-        sh = shutil.which("sh")
-        script = spec.workspace / f"{spec.name}.sh"
-        script.parent.mkdir(exist_ok=True)
-        cpus_per_node = self.backend.count_per_node("cpu")
-        with open(script, "w") as fh:
-            fh.write(f"#!{sh}\n")
-            fh.write("#PBS -V\n")
-            fh.write(f"#PBS -N {spec.name}\n")
-            fh.write(f"#PBS -l nodes={spec.nodes}:ppn={cpus_per_node}\n")
-            fh.write(f"#PBS -l walltime={hhmmss(spec.time_limit * 1.25, threshold=0)}\n")
-            if spec.output:
-                if spec.output == spec.error:
-                    fh.write("#PBS -j oe\n")
-                fh.write(f"#PBS -o {spec.output}\n")
-            if spec.error:
-                if spec.error != spec.output:
-                    fh.write(f"#PBS -e {spec.error}\n")
-            for arg in self.config["default_options"]:
-                fh.write(f"#PBS {arg}\n")
-            for arg in spec.submit_args:
-                fh.write(f"#PBS {arg}\n")
-            for var, val in spec.env.items():
-                if val is None:
-                    fh.write(f"unset {var}\n")
-                else:
-                    fh.write(f'export {var}="{val}"\n')
-            for command in spec.commands:
-                fh.write(f"{command}\n")
-        set_executable(script)
+        script = self.write_script(spec, self.render(spec))
         return spec.with_updates(commands=[str(script)])
 
+    def render(self, spec: hpc_connect.JobSpec) -> str:
+        sh = which("sh")
+        cpus_per_node = self.backend.count_per_node("cpu")
+        lines: list[str] = [f"#!{sh}", "#PBS -V"]
+        lines.append(f"#PBS -N {spec.name}")
+        lines.append(f"#PBS -l nodes={spec.nodes}:ppn={cpus_per_node}")
+        lines.append(f"#PBS -l walltime={hhmmss(spec.time_limit * 1.25, threshold=0)}")
+        if spec.output:
+            if spec.output == spec.error:
+                lines.append("#PBS -j oe")
+            lines.append(f"#PBS -o {spec.output}")
+        if spec.error:
+            if spec.error != spec.output:
+                lines.append(f"#PBS -e {spec.error}")
+        lines.extend([f"#PBS {arg}" for arg in self.config["default_options"]])
+        lines.extend([f"#PBS {arg}" for arg in spec.submit_args])
+        for var, val in spec.env.items():
+            lines.append(f"unset {var}" if val is None else f'export {var}="{val}"')
+        lines.extend(spec.commands)
+        lines.append("")
+        return "\n".join(lines)
+
+    @staticmethod
+    def write_script(spec: hpc_connect.JobSpec, text: str) -> Path:
+        script = spec.workspace / f"{spec.name}.sh"
+        write_executable(script, text, mkdir=True)
+        return script
+
     def submit(self, spec: hpc_connect.JobSpec, exclusive: bool = True) -> hpc_connect.HPCProcess:
-        s = self.prepare(spec)
-        return PBSProcess(s.commands[0])
+        text = self.render(spec)
+        script = self.write_script(spec, text)
+        return PBSProcess(str(script), script_text=text)
@@ -2,37 +2,45 @@
 #
 # SPDX-License-Identifier: MIT
 
-import datetime
 import json
 import logging
 import os
-import shutil
 import subprocess
 import time
 
 import hpc_connect
+from hpc_connect.util import which
 
 logger = logging.getLogger("hpc_connect.pbs.submit")
 
 
 class PBSProcess(hpc_connect.HPCProcess):
-    def __init__(self, script: str) -> None:
+    def __init__(self, script: str, *, script_text: str | None = None) -> None:
         self._rc: int | None = None
+        # the adapter passes along the script it just wrote, for reporting a failed submission
+        self.script_text = script_text
         self.jobid = self.submit(script)
         logger.debug(f"Submitted batch with jobid={self.jobid}")
 
     def submit(self, script: str) -> str:
-        qsub = shutil.which("qsub")
+        qsub = which("qsub")
         if qsub is None:
             raise RuntimeError("qsub not found on PATH")
         args = [qsub, script]
-        p = subprocess.Popen(args, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
-        out, _ = p.communicate()
-        result = str(out.decode("utf-8")).strip()
+        # With close_fds=False and an absolute executable path, subprocess can use posix_spawn
+        # instead of fork+exec, avoiding the page table copy of a large parent process
+        proc = subprocess.run(
+            args,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            encoding="utf-8",
+            close_fds=False,
+        )
+        result = proc.stdout.strip()
         self.submitted = time.time()
         dirname, basename = os.path.split(script)
         with open(os.path.join(dirname, "qsub.meta.json"), "w") as fh:
-            date = datetime.datetime.now().strftime("%c")
+            date = time.strftime("%c")
             meta = {"args": " ".join(args), "date": date, "stdout/stderr": result}
             json.dump({"meta": meta}, fh, indent=2)
         parts = result.split()
@@ -43,9 +51,10 @@ class PBSProcess(hpc_connect.HPCProcess):
         for line in result.split("\n"):
             logger.error(f"    {line}")
         logger.error(f"    qsub submission line: {' '.join(args)}")
-        with open(script) as fh:
-            script_lines = fh.read()
-        logger.error(f"    qsub script: {script_lines}")
+        if self.script_text is None:
+            with open(script) as fh:
+                self.script_text = fh.read()
+        logger.error(f"    qsub script: {self.script_text}")
         raise hpc_connect.SubmissionFailedError
 
     @property
@@ -57,7 +66,7 @@ class PBSProcess(hpc_connect.HPCProcess):
         self._rc = arg
 
     def poll(self) -> int | None:
-        qstat = shutil.which("qstat")
+        qstat = which("qstat")
         if qstat is None:
             raise RuntimeError("qstat not found on PATH")
         out = subprocess.check_output([qstat], encoding="utf-8")
@@ -87,7 +96,7 @@ class PBSProcess(hpc_connect.HPCProcess):
 
     def cancel(self) -> None:
         logger.warning(f"cancelling pbs job {self.jobid}")
-        qdel = shutil.which("qdel")
+        qdel = which("qdel")
         if qdel is None:
             raise RuntimeError("qdel not found on PATH")
         self.returncode = 1
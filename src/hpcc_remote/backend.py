@@ -3,11 +3,11 @@
 # SPDX-License-Identifier: MIT
 
 import logging
-import shutil
 from typing import Any
 
 import hpc_connect
-from hpc_connect.util import set_executable
+from hpc_connect.util import which
+from hpc_connect.util import write_executable
 
 from .process import RemoteSubprocess
 
@@ -18,7 +18,7 @@ class RemoteBackend(hpc_connect.Backend):
     type = "remote_subprocess"
 
     def __init__(self, cfg: dict[str, Any] | None = None) -> None:
-        ssh = shutil.which("ssh")
+        ssh = which("ssh")
         if ssh is None:
             raise ValueError("ssh not found on PATH")
         super().__init__(cfg=cfg)
@@ -70,21 +70,15 @@ class RemoteAdapter:
         return 0.5
 
     def prepare(self, spec: hpc_connect.JobSpec) -> hpc_connect.JobSpec:
-        sh = shutil.which("sh")
+        sh = which("sh")
         script = spec.workspace / f"{spec.name}.sh"
-        script.parent.mkdir(exist_ok=True)
-        with open(script, "w") as fh:
-            fh.write(f"#!{sh}\n")
-            for arg in spec.submit_args:
-                fh.write(f"#BASH {arg}\n")
-            for var, val in spec.env.items():
-                if val is None:
-                    fh.write(f"unset {var}\n")
-                else:
-                    fh.write(f'export {var}="{val}"\n')
-            for command in spec.commands:
-                fh.write(f"{command}\n")
-        set_executable(script)
+        lines: list[str] = [f"#!{sh}"]
+        lines.extend([f"#BASH {arg}" for arg in spec.submit_args])
+        for var, val in spec.env.items():
+            lines.append(f"unset {var}" if val is None else f'export {var}="{val}"')
+        lines.extend(spec.commands)
+        lines.append("")
+        write_executable(script, "\n".join(lines), mkdir=True)
         return spec.with_updates(commands=[script])
 
     def submit(self, spec: hpc_connect.JobSpec, exclusive: bool = True) -> hpc_connect.HPCProcess:
@@ -2,29 +2,31 @@
 #
 # SPDX-License-Identifier: MIT
 
+import functools
 import logging
 import os
-import shutil
 import subprocess
 import time
-import weakref
 from typing import TextIO
 
-import psutil
-
 import hpc_connect
+from hpc_connect.local import close_streams
+from hpc_connect.local import kill_process_tree
+from hpc_connect.local import streamify
+from hpc_connect.util import which
 
 logger = logging.getLogger("hpc_connect.remote.process")
 
 
-def streamify(arg: str | None) -> TextIO | None:
-    if arg is None:
-        return None
-    os.makedirs(os.path.dirname(arg), exist_ok=True)
-    return open(arg, mode="w")
+@functools.cache
+def nodename() -> str:
+    return os.uname().nodename
 
 
 class RemoteSubprocess(hpc_connect.HPCProcess):
+    # polls the local ssh process
+    cheap_poll = True
+
     def __init__(
         self,
         host: str,
@@ -32,12 +34,10 @@ class RemoteSubprocess(hpc_connect.HPCProcess):
         output: str | None = None,
         error: str | None = None,
     ) -> None:
-        ssh = shutil.which("ssh")
+        ssh = which("ssh")
         if ssh is None:
             raise RuntimeError("ssh not found on PATH")
         stdout = streamify(output)
-        if stdout is not None:
-            weakref.finalize(stdout, stdout.close)
         stderr: TextIO | int | None
         if error is None:
             stderr = None
@@ -45,10 +45,11 @@ class RemoteSubprocess(hpc_connect.HPCProcess):
             stderr = subprocess.STDOUT
         else:
             stderr = streamify(error)
-        if hasattr(stderr, "write"):
-            weakref.finalize(stderr, stderr.close)  # type: ignore
-        hostname = "localhost" if host == os.uname().nodename else host
-        self.proc = subprocess.Popen([ssh, hostname, script], stdout=stdout, stderr=stderr)
+        hostname = "localhost" if host == nodename() else host
+        try:
+            self.proc = subprocess.Popen([ssh, hostname, script], stdout=stdout, stderr=stderr)
+        finally:
+            close_streams(stdout, stderr)
         self.submitted = self.started = time.time()
         self.jobid = str(self.proc.pid)
 
@@ -64,22 +65,5 @@ class RemoteSubprocess(hpc_connect.HPCProcess):
         return self.proc.poll()
 
     def cancel(self) -> None:
-        """Kill a process tree (including grandchildren)"""
         logger.warning(f"cancelling shell batch with pid {self.proc.pid}")
-        try:
-            parent = psutil.Process(self.proc.pid)
-        except psutil.NoSuchProcess:
-            return
-        children = parent.children(recursive=True)
-        children.append(parent)
-        for p in children:
-            try:
-                p.terminate()
-            except Exception:  # nosec B110
-                pass
-        _, alive = psutil.wait_procs(children)
-        for p in alive:
-            try:
-                p.kill()
-            except Exception:  # nosec B110
-                pass
+        kill_process_tree(self.proc.pid)
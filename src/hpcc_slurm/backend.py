@@ -3,29 +3,46 @@
 # SPDX-License-Identifier: MIT
 
 import logging
-import shutil
+import os
+from pathlib import Path
 from typing import Any
+from typing import Callable
+from typing import Type
 
 import hpc_connect
+from hpc_connect.launch import LaunchAdapter
 from hpc_connect.mpi import MPIExecAdapter
-from hpc_connect.util import set_executable
+from hpc_connect.util import which
+from hpc_connect.util import write_executable
 from hpc_connect.util.time import hhmmss
 
-from .discover import read_sinfo
-from .launch import SrunAdapter
+from .discover import read_cpu_topology
+from .discover import read_sinfo_cached
 from .process import SlurmProcess
 
 logger = logging.getLogger("hpc_connect.slurm.submit")
 
 
+def srun_adapter() -> type[LaunchAdapter]:
+    from .launch import SrunAdapter
+
+    return SrunAdapter
+
+
 class SlurmBackend(hpc_connect.Backend):
     type = "slurm"
+    # launch type -> adapter loader; any other type launches through mpiexec.  Loaders defer
+    # importing an adapter until a launcher of that type is actually requested
+    launch_adapters: dict[str, Callable[[], Type[LaunchAdapter]]] = {
+        "srun": srun_adapter,
+        "mpi": lambda: MPIExecAdapter,
+    }
 
     def __init__(self, cfg: dict[str, Any] | None = None) -> None:
-        sbatch = shutil.which("sbatch")
+        sbatch = which("sbatch")
         if sbatch is None:
             raise ValueError("sbatch not found on PATH")
-        sacct = shutil.which("sacct")
+        sacct = which("sacct")
         if sacct is None:
             raise ValueError("sacct not found on PATH")
         self._resource_specs: list[dict] | None = None
@@ -34,13 +51,50 @@ class SlurmBackend(hpc_connect.Backend):
     @property
     def resource_specs(self) -> list[dict]:
         if self._resource_specs is None:
-            if sinfo := read_sinfo():
+            if spec := self.allocation_spec():
+                self._resource_specs = [spec]
+            elif sinfo := read_sinfo_cached():
                 self._resource_specs = [sinfo]
             else:
                 raise ValueError("Unable to determine system configuration from sinfo")
         assert self._resource_specs is not None
         return self._resource_specs
 
+    @staticmethod
+    def allocation_spec() -> dict[str, Any] | None:
+        """Describe a single node allocation from the environment, without asking slurmctld.
+        The layout is counted as read_sinfo counts it -- cores, not hardware threads, under their
+        sockets.  Multi-node allocations, and hosts whose topology cannot be read, still go
+        through sinfo.
+
+        Note that this describes the allocation -- the CPUs this job step may use -- not the
+        node type that sinfo reports: inside a job, counts per node (and sizes derived from them,
+        e.g. by nodes_required) are those of the allocation.  Only processes that slurmd started
+        on the allocated node qualify; an salloc shell on a login node does not"""
+        if not os.getenv("SLURM_JOB_ID") or os.getenv("SLURM_NNODES") != "1":
+            return None
+        # SLURMD_NODENAME is set only for processes spawned by slurmd, i.e. on a compute node.
+        # Compare short names: the hostname may be fully qualified where the node name is not
+        node = os.getenv("SLURMD_NODENAME")
+        if not node or node.split(".")[0] != os.uname().nodename.split(".")[0]:
+            return None
+        if not hasattr(os, "sched_getaffinity"):
+            return None
+        if (topology := read_cpu_topology(os.sched_getaffinity(0))) is None:
+            return None
+        sockets, cores_per_socket = topology
+        cpu_resource = {"type": "cpu", "count": cores_per_socket}
+        socket_resource = {"type": "socket", "count": sockets, "resources": [cpu_resource]}
+        spec: dict[str, Any] = {"type": "node", "count": 1, "resources": [socket_resource]}
+        gpus: int = 0
+        if var := os.getenv("SLURM_GPUS_ON_NODE"):
+            gpus = int(var)
+        elif var := os.getenv("CUDA_VISIBLE_DEVICES"):
+            gpus = len(var.split(","))
+        if gpus:
+            spec["resources"].append({"type": "gpu", "count": gpus})
+        return spec
+
     @property
     def valid_launchers(self) -> set[str]:
         return {"srun", "mpi"}
@@ -74,21 +128,15 @@ class SlurmBackend(hpc_connect.Backend):
         return hpc_connect.HPCSubmissionManager(adapter=SbatchAdapter(config=self.config["submit"]))
 
     def launcher(self) -> hpc_connect.HPCLauncher:
-        type = self.config["launch"]["type"]
-        if type == "srun":
-            return hpc_connect.HPCLauncher(
-                adapter=SrunAdapter(backend=self, config=self.config["launch"])
-            )
-        else:
-            return hpc_connect.HPCLauncher(
-                adapter=MPIExecAdapter(backend=self, config=self.config["launch"])
-            )
+        loader = self.launch_adapters.get(self.config["launch"]["type"])
+        adapter_t = MPIExecAdapter if loader is None else loader()
+        return hpc_connect.HPCLauncher(adapter=adapter_t(backend=self, config=self.config["launch"]))
 
 
 class SbatchAdapter:
     def __init__(self, config: dict[str, Any]) -> None:
         self.config = config
-        sbatch = shutil.which("sbatch")
+        sbatch = which("sbatch")
         if sbatch is None:
             raise ValueError("sbatch not found on PATH")
 
@@ -98,34 +146,46 @@ class SbatchAdapter:
         return 15.0
 
     def prepare(self, spec: hpc_connect.JobSpec) -> hpc_connect.JobSpec:
-        sh = shutil.which("sh")
-        script = spec.workspace / f"{spec.name}.sh"
-        script.parent.mkdir(exist_ok=True)
-        with open(script, "w") as fh:
-            fh.write(f"#!{sh}\n")
-            fh.write(f"#SBATCH --nodes={spec.nodes}\n")
-            fh.write(f"#SBATCH --time={hhmmss(spec.time_limit * 1.25, threshold=0)}\n")
-            fh.write(f"#SBATCH --job-name={spec.name}\n")
-            if spec.error:
-                fh.write(f"#SBATCH --error={spec.error}\n")
-            if spec.output:
-                fh.write(f"#SBATCH --output={spec.output}\n")
-            if spec.dependencies:
-                fh.write(f"#SBATCH --dependency=afterany:{':'.join(spec.dependencies)}\n")
-            for arg in self.config["default_options"]:
-                fh.write(f"#SBATCH {arg}\n")
-            for arg in spec.submit_args:
-                fh.write(f"#SBATCH {arg}\n")
-            for var, val in spec.env.items():
-                if val is None:
-                    fh.write(f"unset {var}\n")
-                else:
-                    fh.write(f'export {var}="{val}"\n')
-            for command in spec.commands:
-                fh.write(f"{command}\n")
-        set_executable(script)
+        script = self.write_script(spec, self.render(spec))
         return spec.with_updates(commands=[str(script)])
 
+    def render(self, spec: hpc_connect.JobSpec) -> str:
+        sh = which("sh")
+        lines: list[str] = [f"#!{sh}"]
+        lines.append(f"#SBATCH --nodes={spec.nodes}")
+        lines.append(f"#SBATCH --time={hhmmss(spec.time_limit * 1.25, threshold=0)}")
+        lines.append(f"#SBATCH --job-name={spec.name}")
+        if spec.error:
+            lines.append(f"#SBATCH --error={spec.error}")
+        if spec.output:
+            lines.append(f"#SBATCH --output={spec.output}")
+        if spec.dependencies:
+            lines.append(f"#SBATCH --dependency=afterany:{':'.join(spec.dependencies)}")
+        for arg in self.config["default_options"]:
+            lines.append(f"#SBATCH {arg}")
+        for arg in spec.submit_args:
+            lines.append(f"#SBATCH {arg}")
+        for var, val in spec.env.items():
+            if val is None:
+                lines.append(f"unset {var}")
+            else:
+                lines.append(f'export {var}="{val}"')
+        lines.extend(spec.commands)
+        lines.append("")
+        return "\n".join(lines)
+
+    @staticmethod
+    def write_script(spec: hpc_connect.JobSpec, text: str) -> Path:
+        script = spec.workspace / f"{spec.name}.sh"
+        write_executable(script, text, mkdir=True)
+        return script
+
     def submit(self, spec: hpc_connect.JobSpec, exclusive: bool = True) -> hpc_connect.HPCProcess:
-        s = self.prepare(spec)
-        return SlurmProcess(s.commands[0])
+        # sbatch is given the script's path, not its text, so that Slurm records the script as
+        # the job's command
+        script = self.write_script(spec, self.render(spec))
+        # The adapter wrote the #SBATCH directives itself, so there is no need for the process to
+        # read them back from the script
+        options = [*self.config["default_options"], *spec.submit_args]
+        clusters = SlurmProcess.parse_clusters(options)
+        return SlurmProcess(str(script), clusters=clusters or "")
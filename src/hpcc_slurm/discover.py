@@ -2,18 +2,69 @@
 #
 # SPDX-License-Identifier: MIT
 
+import copy
+import functools
 import json
 import logging
 import os
-import re
 import shlex
 import shutil
 import subprocess
+import threading
+import time
 from typing import Any
+from typing import Iterable
 
 logger = logging.getLogger("hpc_connect.slurm.discover")
 
 
+_sinfo_lock = threading.Lock()
+
+
+@functools.lru_cache(maxsize=1)
+def _read_sinfo_once(epoch: int) -> dict[str, Any] | None:
+    return read_sinfo()
+
+
+def read_sinfo_cached() -> dict[str, Any] | None:
+    """The system configuration rarely changes over a run: only ask sinfo once per process, or
+    once every ``HPC_CONNECT_SINFO_TTL`` seconds if that is set.  Returns a copy, since callers are
+    free to modify the result"""
+    epoch = 0
+    if ttl := float(os.getenv("HPC_CONNECT_SINFO_TTL") or 0):
+        epoch = int(time.monotonic() // ttl)
+    # concurrent callers wait for the one query in flight rather than each running sinfo
+    with _sinfo_lock:
+        info = _read_sinfo_once(epoch)
+        if info is None:
+            # sinfo failed or is missing: try again next time rather than for the whole run
+            _read_sinfo_once.cache_clear()
+    return copy.deepcopy(info)
+
+
+SYSFS_CPU = "/sys/devices/system/cpu"
+
+
+def read_cpu_topology(cpus: Iterable[int]) -> tuple[int, int] | None:
+    """Count the (sockets, cores per socket) that logical ``cpus`` belong to, as sinfo counts them:
+    hardware threads of one core count once.  Returns None if the topology cannot be read"""
+    cores: set[tuple[str, str]] = set()
+    for cpu in cpus:
+        topology = os.path.join(SYSFS_CPU, f"cpu{cpu}", "topology")
+        try:
+            with open(os.path.join(topology, "physical_package_id")) as fh:
+                package = fh.read().strip()
+            with open(os.path.join(topology, "core_id")) as fh:
+                core = fh.read().strip()
+        except OSError:
+            return None
+        cores.add((package, core))
+    if not cores:
+        return None
+    sockets = len({package for package, _ in cores})
+    return sockets, max(1, len(cores) // sockets)
+
+
 def read_sinfo() -> dict[str, Any] | None:
     if sinfo := shutil.which("sinfo"):
         opts = [
@@ -36,11 +87,9 @@ def read_sinfo() -> dict[str, Any] | None:
             threads_per_core: int
             cpus_per_node: int
             node_count: int
-            for line in proc.stdout.split("\n"):
+            for line in proc.stdout.splitlines():
                 parts = line.split()
-                if not parts:
-                    continue
-                elif parts and parts[0].startswith("SOCKETS"):
+                if not parts or parts[0].startswith("SOCKETS"):
                     continue
                 data = [safe_loads(part) for part in parts]
                 sockets_per_node = data[0]
@@ -95,12 +144,11 @@ def read_sinfo() -> dict[str, Any] | None:
 
 
 def safe_loads(arg: str) -> Any:
+    arg = arg.rstrip("+")
     if arg == "(null)":
         return None
     if ":" in arg:
-        arg = strip_gres_suffixes(arg)
-    if arg.endswith("+"):
-        return safe_loads(arg[:-1])
+        arg = strip_gres_suffixes(arg).rstrip("+")
     try:
         return json.loads(arg)
     except json.JSONDecodeError:
@@ -116,7 +164,14 @@ def strip_gres_suffix(gres: str) -> str:
         "mem:128G(S:0-3)" -> "mem:128G"
         "gpu:h100:4" -> "gpu:h100:4" (no change)
     """
-    return re.sub(r"\s*\([^)]*\)\s*$", "", gres)
+    text = gres.rstrip()
+    if not text.endswith(")"):
+        return gres
+    # the suffix opens at the first "(" after any earlier ")"
+    i = text.find("(", text.rfind(")", 0, -1) + 1, -1)
+    if i == -1:
+        return gres
+    return text[:i].rstrip()
 
 
 def strip_gres_suffixes(gres_field: str) -> str:
@@ -1,79 +1,77 @@
-import io
+import itertools
 import os
-import shutil
 
 from hpc_connect.launch import LaunchAdapter
 from hpc_connect.launch import LaunchSpec
 
+# Process counts are given to srun globally in MPMD mode: these are dropped from each spec's line
+_NP_FLAGS = frozenset(("-n", "-np"))
+_NP_PREFIXES = ("-n=", "-np=")
+
 
 class SrunAdapter(LaunchAdapter):
+    name: str = "srun"
+
     def join_specs(self, specs: list["LaunchSpec"]) -> list[str]:
         """Count the total number of processes and write a srun.conf file to
         split the jobs across ranks
 
         """
-        name = self.config.get("exec") or "srun"
-        exec = shutil.which(name)
-        if exec is None:
-            raise ValueError(f"{name}: executable not found on PATH")
+        exec = self.executable
         if len(specs) > 1:
             return self._join_mpmd(exec, specs)
         return self._join_spmd(exec, specs[0])
 
     def _join_spmd(self, exec: str, spec: LaunchSpec) -> list[str]:
-        argv = [os.fsdecode(exec)]
         view = self.backend.resource_view(ranks=spec.processes)
-        for opt in self.config["default_options"]:
-            argv.append(self.expand_one(opt, **view))
         launch_opts, program_opts = spec.partition()
-        for opt in launch_opts:
-            argv.append(self.expand_one(opt, **view))
-        for opt in self.config["pre_options"]:
-            argv.append(self.expand_one(opt, **view))
-        for opt in program_opts:
-            argv.append(self.expand_one(opt, **view))
-        return argv
+        return [
+            os.fsdecode(exec),
+            *self.expand_options("default_options", view),
+            *self.expand_args(launch_opts, view),
+            *self.expand_options("pre_options", view),
+            *self.expand_args(program_opts, view),
+        ]
 
     def _join_mpmd(self, exec: str, specs: list["LaunchSpec"]) -> list[str]:
-        np: int = 0
-        fp = io.StringIO()
-        for spec in specs:
-            ranks: str
-            p = spec.processes
-            if p:
-                ranks = f"{np}-{np + p - 1}"
-                np += p
-            else:
-                ranks = str(np)
-                np += 1
-            launch_opts, program_opts = spec.partition()
-            fp.write(ranks)
-            view = self.backend.resource_view(ranks=p)
-            for opt in self.config["mpmd"]["local_options"]:
-                fp.write(f" {self.expand_one(opt, **view)}")
-            iter_opts = iter(launch_opts)
-            for opt in iter_opts:
-                if opt == "-n":
-                    next(iter_opts)
-                elif opt == "-np":
-                    next(iter_opts)
-                elif opt.startswith(("-n=", "-np=")):
-                    continue
-                else:
-                    fp.write(f" {self.expand_one(opt, **view)}")
-            for opt in self.config["pre_options"]:
-                fp.write(f" {self.expand_one(opt, **view)}")
-            for opt in program_opts:
-                fp.write(f" {self.expand_one(opt, **view)}")
-            fp.write("\n")
+        starts = [0, *itertools.accumulate(spec.processes or 1 for spec in specs)]
+        np: int = starts[-1]
+        expand = self.expand_one
+        # specs commonly share a process count: build each distinct resource view, and expand
+        # the configured options against it, once
+        expanded: dict[int, tuple[dict[str, int], list[str], list[str]]] = {}
+        resource_view, expand_options = self.backend.resource_view, self.expand_options
         file = "launch-multi-prog.conf"
-        with open(file, "w") as fh:
-            fh.write(fp.getvalue())
+        # Write each rank range as it is formed rather than holding the whole conf in memory
+        with open(file, "w", buffering=1 << 16) as fh:
+            for spec, start in zip(specs, starts):
+                p = spec.processes
+                ranks = f"{start}-{start + p - 1}" if p else str(start)
+                launch_opts, program_opts = spec.partition()
+                words: list[str] = [ranks]
+                # a spec without a process count occupies a single rank
+                launch_np = p or 1
+                if launch_np not in expanded:
+                    view = resource_view(ranks=launch_np)
+                    local_opts = expand_options("local_options", view)
+                    expanded[launch_np] = (view, local_opts, expand_options("pre_options", view))
+                view, local_opts, pre_opts = expanded[launch_np]
+                words.extend(local_opts)
+                iter_opts = iter(launch_opts)
+                for opt in iter_opts:
+                    if opt in _NP_FLAGS:
+                        next(iter_opts)
+                    elif opt.startswith(_NP_PREFIXES):
+                        continue
+                    else:
+                        words.append(expand(opt, **view) if "%" in opt else opt)
+                words.extend(pre_opts)
+                words.extend(self.expand_args(program_opts, view))
+                fh.write(" ".join(words))
+                fh.write("\n")
         cmd = [os.fsdecode(exec)]
         view = self.backend.resource_view(ranks=np)
-        for opt in self.config["mpmd"]["global_options"]:
-            cmd.append(self.expand_one(opt, **view))
-        for opt in self.config["default_options"]:
-            cmd.append(self.expand_one(opt, **view))
+        cmd.extend(self.expand_options("global_options", view))
+        cmd.extend(self.expand_options("default_options", view))
         cmd.extend([f"-n{np}", "--multi-prog", file])
         return cmd
@@ -2,51 +2,89 @@
 #
 # SPDX-License-Identifier: MIT
 
-import argparse
-import datetime
+import functools
 import json
 import logging
+import math
 import os
 import re
-import shutil
 import subprocess
+import threading
 import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
 from typing import Any
+from typing import Iterable
+from typing import cast
 
 import hpc_connect
+from hpc_connect.util import which
+
+from . import restd
 
 logger = logging.getLogger("hpc_connect.slurm.submit")
 
+_CLUSTERS_RE = re.compile(r"^(?:-M\s*=?|--clusters?[=\s])\s*(\S+)")
+_SBATCH_CLUSTERS_RE = re.compile(r"^#SBATCH\s+(?:-M\s*=?|--clusters?[=\s])\s*(\S+)")
+# sbatch may print banner lines (e.g., allocation charges) before the jobid, so search for it
+_SUBMIT_RE = re.compile(r"Submitted batch job\s+(\S+)(?:\s+on cluster\s+(\S+))?")
+
 
 class SlurmProcess(hpc_connect.HPCProcess):
-    def __init__(self, script: str, emit_interval: float = 300.0) -> None:
+    # Polls closer together than this return the last known state without querying Slurm.  The
+    # interval backs off while the job's state does not change and resets when it does
+    min_poll_interval: float = 2.0
+    max_poll_interval: float = 30.0
+    cheap_poll = True
+
+    def __init__(
+        self,
+        script: str,
+        emit_interval: float = 300.0,
+        *,
+        clusters: str | None = None,
+    ) -> None:
         self._rc: int | None = None
-        self.clusters: str | None = None
+        # clusters=None means "unknown": the script's -M/--clusters directive is used at submit
+        # time.  Either way $SLURM_CLUSTERS, and then sbatch's own report, have the last word
+        self.clusters: str | None = clusters
         self.script = os.path.abspath(script)
         self.script_dir = os.path.dirname(self.script)
         self.jobid = self.submit(script)
         self.last_debug_emit = -1.0
         self.emit_interval = emit_interval
+        self.state: str | None = None
+        self.last_poll: float = -math.inf
+        self.poll_interval: float = self.min_poll_interval
+        acct_poller.add(self)
         f = os.path.basename(self.script)
         logger.debug(f"Submitted batch script {f} with jobid={self.jobid}")
 
     def submit(self, script: str) -> str:
-        sbatch = shutil.which("sbatch")
+        sbatch = which("sbatch")
         if sbatch is None:
             raise ValueError("sbatch not found on PATH")
-        ns = self.parse_script_args(script)
-        if ns.clusters:
-            self.clusters = ns.clusters
+        if var := os.getenv("SLURM_CLUSTERS"):
+            # sbatch reads SLURM_CLUSTERS too, and it takes precedence over #SBATCH directives
+            self.clusters = var
+        elif self.clusters is None:
+            self.clusters = self.parse_script_args(script)
         args = [sbatch, script]
-        proc = subprocess.run(args, check=True, encoding="utf-8", capture_output=True)
+        # Descriptors opened by Python are non-inheritable (PEP 446), so there is nothing for
+        # close_fds to do here except walk the fd table, which is costly when RLIMIT_NOFILE is large
+        proc = subprocess.run(
+            args, check=True, encoding="utf-8", capture_output=True, close_fds=False
+        )
         self.submitted = time.time()
         with open(os.path.join(self.script_dir, "submit.meta.json"), "w") as fh:
-            date = datetime.datetime.now().strftime("%c")
+            date = time.strftime("%c")
             meta = {"args": " ".join(args), "date": date, "stdout/stderr": proc.stdout}
             json.dump({"meta": meta}, fh, indent=2)
-        if match := re.match(r"Submitted batch job (\S*)", proc.stdout):
-            jobid = match.group(1).strip()
-            return jobid
+        if match := _SUBMIT_RE.search(proc.stdout):
+            if match.group(2):
+                # where sbatch says the job went is the final answer
+                self.clusters = match.group(2)
+            return match.group(1)
         logger.error(f"Failed to find jobid!\n    The following output was received from {sbatch}:")
         for line in proc.stdout.split("\n"):
             logger.log(logging.ERROR, f"    {line}")
@@ -55,16 +93,23 @@ class SlurmProcess(hpc_connect.HPCProcess):
         raise hpc_connect.SubmissionFailedError
 
     @staticmethod
-    def parse_script_args(script: str) -> argparse.Namespace:
-        args = []
+    def parse_script_args(script: str) -> str | None:
+        """Return the clusters requested by the first -M/--clusters directive in ``script``"""
         with open(script, "r") as file:
             for line in file:
-                if match := re.search(r"^#SBATCH\s+(.*)$", line):
-                    args.append(match.group(1).strip())
-        p = argparse.ArgumentParser()
-        p.add_argument("-M", "--cluster", "--clusters", dest="clusters")
-        ns, _ = p.parse_known_args(args)
-        return ns
+                if not line.startswith("#SBATCH"):
+                    continue
+                if match := _SBATCH_CLUSTERS_RE.match(line):
+                    return match.group(1)
+        return None
+
+    @staticmethod
+    def parse_clusters(args: Iterable[str]) -> str | None:
+        """Return the value of the first -M/--clusters option in ``args``"""
+        for arg in args:
+            if match := _CLUSTERS_RE.match(arg):
+                return match.group(1)
+        return None
 
     @property
     def returncode(self) -> int | None:
@@ -75,63 +120,209 @@ class SlurmProcess(hpc_connect.HPCProcess):
         self._rc = arg
 
     def poll(self) -> int | None:
-        sacct = shutil.which("sacct")
-        if sacct is None:
-            raise RuntimeError("sacct not found on PATH")
-        max_tries: int = 20
-        acct_data: dict[str, dict[str, Any]] = {}
-        for _ in range(max_tries):
-            args = [sacct, "--noheader", "-j", self.jobid, "-p", "-b"]
-            if self.clusters:
-                args.append(f"--clusters={self.clusters}")
-            proc = subprocess.run(args, encoding="utf-8", capture_output=True)
-            out = proc.stdout
-            lines = [line.strip() for line in out.splitlines() if line.split()]
-            now = time.time()
-            if now - self.last_debug_emit >= self.emit_interval:
-                logger.debug(f"Polling slurm job {self.jobid}:\n$ {' '.join(args)!r}\n{out}")
-                self.last_debug_emit = now
-            if proc.returncode != 0:
-                logger.warning(f"sacct returned non-zero status {proc.returncode}")
-                continue
-            if lines:
-                for line in lines:
-                    jobid, state, exit_code = [_.strip() for _ in line.split("|") if _.split()]
-                    try:
-                        returncode, signal = [int(_) for _ in exit_code.split(":")]
-                    except ValueError:
-                        returncode = int(exit_code)
-                        signal = 0
-                    acct_data[jobid] = {
-                        "state": state.split()[0].rstrip("+"),
-                        "returncode": returncode,
-                        "signal": signal,
-                    }
-                break
-            time.sleep(0.5)
+        if self.returncode is not None:
+            return self.returncode
+        now = time.monotonic()
+        if now - self.last_poll < self.poll_interval:
+            return None
+        self.last_poll = now
+        jobinfo: dict[str, Any] | None = None
+        if not self.clusters and (client := restd.get_client()):
+            # slurmrestd only knows about its own cluster
+            jobinfo = client.job_info(self.jobid)
+        if jobinfo is None:
+            jobinfo = acct_poller.jobinfo(self)
+        if jobinfo is None:
+            # not in the shared query (yet): ask for this job alone, retrying while slurmdbd catches up
+            jobinfo = read_acct_data([self.jobid], clusters=self.clusters).get(self.jobid)
+        if jobinfo is None:
+            raise RuntimeError(f"Accounting data for job {self.jobid} not returned by sacct")
+        if jobinfo["state"] != self.state:
+            self.state = jobinfo["state"]
+            self.poll_interval = self.min_poll_interval
         else:
-            cmd, err = " ".join(args), proc.stderr or ""
-            raise RuntimeError(
-                f"$ {cmd}\n{out}\n{err}\n==> Error: could not determine state from accounting data"
-            )
-
-        if jobinfo := acct_data.get(self.jobid):
-            if jobinfo["state"].upper() == "RUNNING" and self.started <= 0.0:
-                self.started = time.time()
-            if jobinfo["state"].upper() in ("PENDING", "RUNNING"):
-                return None
-            self.returncode = max(jobinfo["returncode"], jobinfo["signal"])
-            if jobinfo["signal"]:
-                logger.error(f"Job {self.jobid} failed with signal {jobinfo['signal']}")
+            self.poll_interval = min(1.5 * self.poll_interval, self.max_poll_interval)
+        if now - self.last_debug_emit >= self.emit_interval and logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"Polled slurm job {self.jobid}: {jobinfo['state']}")
+            self.last_debug_emit = now
+        if jobinfo["state"].upper() == "RUNNING" and self.started <= 0.0:
+            self.started = time.time()
+        if jobinfo["state"].upper() in ("PENDING", "RUNNING"):
+            return None
+        acct_poller.discard(self)
+        self.returncode = max(jobinfo["returncode"], jobinfo["signal"])
+        if jobinfo["signal"]:
+            logger.error(f"Job {self.jobid} failed with signal {jobinfo['signal']}")
+            if sacct := which("sacct"):
                 f = os.path.join(self.script_dir, f"{self.jobid}.acct.json")
                 with open(f, "w") as fh:
                     args = [sacct, "-j", self.jobid, "--json"]
                     subprocess.run(args, stdout=fh, encoding="utf-8")
-        else:
-            raise RuntimeError(f"Accounting data for job {self.jobid} not returned by sacct")
         return self.returncode
 
     def cancel(self) -> None:
         logger.warning(f"cancelling slurm job {self.jobid}")
-        subprocess.run(["scancel", self.jobid, "--clusters=all"])
+        acct_poller.discard(self)
+        scancel([self.jobid])
         self.returncode = 1
+
+    @classmethod
+    def cancel_many(cls, procs: list["hpc_connect.HPCProcess"]) -> None:
+        # One scancel for the lot, e.g. when a workflow is torn down.  cancel_futures groups
+        # processes by type, so these are all slurm jobs
+        jobs = cast(list[SlurmProcess], procs)
+        if not jobs:
+            return
+        logger.warning(f"cancelling slurm jobs {', '.join(job.jobid for job in jobs)}")
+        for job in jobs:
+            acct_poller.discard(job)
+        scancel([job.jobid for job in jobs])
+        for job in jobs:
+            job.returncode = 1
+
+
+def read_acct_data(
+    jobids: list[str], clusters: str | None = None, max_tries: int = 20
+) -> dict[str, dict[str, Any]]:
+    sacct = which("sacct")
+    if sacct is None:
+        raise RuntimeError("sacct not found on PATH")
+    args = [sacct, "--noheader", "-j", ",".join(jobids), "-p", "-b"]
+    if clusters:
+        args.append(f"--clusters={clusters}")
+    acct_data: dict[str, dict[str, Any]] = {}
+    for _ in range(max_tries):
+        proc = subprocess.run(args, encoding="utf-8", capture_output=True, close_fds=False)
+        out = proc.stdout
+        if proc.returncode != 0:
+            logger.warning(f"sacct returned non-zero status {proc.returncode}")
+            continue
+        lines = [line for line in map(str.strip, out.splitlines()) if line]
+        if lines:
+            for line in lines:
+                # -p -b prints "JobID|State|ExitCode|", with ExitCode as "returncode:signal"
+                jobid, _, rest = line.partition("|")
+                state, _, rest = rest.partition("|")
+                code, sep, sig = rest.partition("|")[0].partition(":")
+                returncode = int(code)
+                signal = int(sig) if sep else 0
+                jobid = jobid.strip()
+                acct_data[jobid] = {
+                    "state": state.split()[0].rstrip("+"),
+                    "returncode": returncode,
+                    "signal": signal,
+                }
+            break
+        time.sleep(0.5)
+    else:
+        cmd, err = " ".join(args), proc.stderr or ""
+        raise RuntimeError(
+            f"$ {cmd}\n{out}\n{err}\n==> Error: could not determine state from accounting data"
+        )
+    return acct_data
+
+
+@functools.cache
+def squeue_has_only_job_state(squeue: str) -> bool:
+    """Does this squeue support --only-job-state (Slurm 24.05+)?"""
+    try:
+        proc = subprocess.run([squeue, "--help"], encoding="utf-8", capture_output=True)
+    except OSError:
+        return False
+    return "--only-job-state" in proc.stdout
+
+
+# squeue's %T states that need no accounting data.  Every other state, COMPLETING included, means
+# the job is finishing or done and its exit status has to come from sacct
+queue_states = {"PENDING": "PENDING", "CONFIGURING": "PENDING", "RUNNING": "RUNNING"}
+
+
+def read_queue_state(jobids: list[str], clusters: str | None = None) -> dict[str, dict[str, Any]]:
+    """Return the state of jobs that ``squeue --only-job-state`` reports as pending or running.
+    Jobs in any other state are omitted: their exit status has to come from sacct"""
+    squeue = which("squeue")
+    if squeue is None or not squeue_has_only_job_state(squeue):
+        return {}
+    # ask for exactly the job id and state: the default format ends with the node list or reason
+    args = [squeue, "--noheader", "--only-job-state", "-o", "%i %T", "-j", ",".join(jobids)]
+    if clusters:
+        args.append(f"--clusters={clusters}")
+    proc = subprocess.run(args, encoding="utf-8", capture_output=True, close_fds=False)
+    if proc.returncode != 0:
+        return {}
+    states: dict[str, dict[str, Any]] = {}
+    for line in proc.stdout.splitlines():
+        # with --clusters, each cluster's jobs follow a "CLUSTER: <name>" line, which is skipped
+        parts = line.split()
+        if len(parts) != 2:
+            continue
+        jobid, state = parts[0], queue_states.get(parts[1].upper())
+        if state is not None:
+            states[jobid] = {"state": state, "returncode": 0, "signal": 0}
+    return states
+
+
+class AcctPoller:
+    """Query accounting data for every live SlurmProcess with one sacct call per cluster and
+    share the result, rather than running sacct once per process per polling tick"""
+
+    def __init__(self, ttl: float = 2.0) -> None:
+        self.ttl = ttl
+        self.procs: weakref.WeakSet[SlurmProcess] = weakref.WeakSet()
+        self.cache: dict[str, dict[str, Any]] = {}
+        self.last_query: float = -1.0
+        self.lock = threading.Lock()
+
+    def add(self, proc: SlurmProcess) -> None:
+        with self.lock:
+            self.procs.add(proc)
+
+    def discard(self, proc: SlurmProcess) -> None:
+        with self.lock:
+            self.procs.discard(proc)
+
+    def jobinfo(self, proc: SlurmProcess) -> dict[str, Any] | None:
+        with self.lock:
+            if proc not in self.procs:
+                return None
+            if proc.jobid not in self.cache or time.monotonic() - self.last_query >= self.ttl:
+                self.refresh()
+            return self.cache.get(proc.jobid)
+
+    def refresh(self) -> None:
+        groups: dict[str, list[str]] = {}
+        for proc in self.procs:
+            groups.setdefault(proc.clusters or "", []).append(proc.jobid)
+        cache: dict[str, dict[str, Any]] = {}
+        if len(groups) > 1:
+            # Jobs on different clusters need separate queries: let their round trips overlap
+            with ThreadPoolExecutor(max_workers=len(groups)) as ex:
+                for result in ex.map(self.query, groups.keys(), groups.values()):
+                    cache.update(result)
+        else:
+            for clusters, jobids in groups.items():
+                cache.update(self.query(clusters, jobids))
+        self.cache = cache
+        self.last_query = time.monotonic()
+
+    @staticmethod
+    def query(clusters: str, jobids: list[str]) -> dict[str, dict[str, Any]]:
+        # Jobs still in the queue are answered from slurmctld's job state cache when possible;
+        # only jobs that have left it need a (slower) trip to the accounting database
+        data = read_queue_state(jobids, clusters=clusters or None)
+        if remaining := [jobid for jobid in jobids if jobid not in data]:
+            try:
+                data.update(read_acct_data(remaining, clusters=clusters or None, max_tries=1))
+            except RuntimeError as e:
+                # jobs missing from the cache are queried individually by SlurmProcess.poll
+                logger.debug(f"Shared sacct query failed: {e}")
+        return data
+
+
+acct_poller = AcctPoller()
+
+
+def scancel(jobids: list[str]) -> None:
+    p = subprocess.run([which("scancel") or "scancel", *jobids, "--clusters=all"])
+    if p.returncode != 0:
+        logger.error(f"scancel {' '.join(jobids)} failed with exit code {p.returncode}")
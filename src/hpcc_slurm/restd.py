@@ -0,0 +1,122 @@
+# Copyright NTESS. See COPYRIGHT file for details.
+#
+# SPDX-License-Identifier: MIT
+
+"""Optional job state queries through slurmrestd.  Set ``HPC_CONNECT_SLURMRESTD_SOCKET`` to the
+path of a slurmrestd unix socket to poll jobs over one persistent connection instead of running
+``sacct`` for every poll.  The REST API version defaults to ``API_VERSION`` and is set with
+``HPC_CONNECT_SLURMRESTD_VERSION``: slurmrestd only serves the few most recent versions."""
+
+import http.client
+import json
+import logging
+import os
+import socket
+import threading
+from typing import Any
+
+logger = logging.getLogger("hpc_connect.slurm.restd")
+
+API_VERSION = "v0.0.39"
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path: str, timeout: float = 10.0) -> None:
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = path
+
+    def connect(self) -> None:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        sock.connect(self.socket_path)
+        self.sock = sock
+
+
+class SlurmRestClient:
+    def __init__(self, path: str, version: str = API_VERSION) -> None:
+        self.path = path
+        self.version = version
+        self.conn = UnixHTTPConnection(path)
+        self.lock = threading.Lock()
+        # set once slurmrestd reports that it does not serve this API version
+        self.disabled = False
+
+    def headers(self) -> dict[str, str]:
+        headers = {"Accept": "application/json"}
+        if token := os.getenv("SLURM_JWT"):
+            headers["X-SLURM-USER-TOKEN"] = token
+            if user := os.getenv("USER"):
+                headers["X-SLURM-USER-NAME"] = user
+        return headers
+
+    def get(self, endpoint: str) -> dict[str, Any] | None:
+        url = f"/slurm/{self.version}/{endpoint}"
+        if self.disabled:
+            return None
+        with self.lock:
+            try:
+                self.conn.request("GET", url, headers=self.headers())
+                response = self.conn.getresponse()
+                body = response.read()
+            except (OSError, http.client.HTTPException) as e:
+                # drop the connection so that the next request reconnects
+                self.conn.close()
+                logger.debug(f"slurmrestd request GET {url} failed: {e}")
+                return None
+        if response.status == 404:
+            logger.warning(
+                f"slurmrestd does not serve API version {self.version}, falling back to sacct.  "
+                "Set HPC_CONNECT_SLURMRESTD_VERSION to a version it supports"
+            )
+            self.disabled = True
+            return None
+        if response.status != 200:
+            logger.debug(f"slurmrestd request GET {url} returned status {response.status}")
+            return None
+        return json.loads(body)
+
+    def job_info(self, jobid: str) -> dict[str, Any] | None:
+        """Return the state of ``jobid`` in the form used by ``SlurmProcess.poll``, or ``None`` if
+        slurmrestd could not provide it"""
+        data = self.get(f"job/{jobid}")
+        if not data or not data.get("jobs"):
+            return None
+        job = data["jobs"][0]
+        state = job.get("job_state")
+        if isinstance(state, list):
+            state = state[0] if state else None
+        if not state:
+            return None
+        exit_code = job.get("exit_code") or {}
+        if not isinstance(exit_code, dict):
+            exit_code = {"return_code": exit_code}
+        return {
+            "state": str(state),
+            "returncode": number(exit_code.get("return_code")),
+            "signal": number((exit_code.get("signal") or {}).get("id")),
+        }
+
+
+def number(arg: Any) -> int:
+    # newer API versions wrap integers as {"set": bool, "infinite": bool, "number": int}
+    if isinstance(arg, dict):
+        arg = arg.get("number") if arg.get("set", True) else 0
+    return int(arg or 0)
+
+
+_clients: dict[tuple[str, str], SlurmRestClient] = {}
+_lock = threading.Lock()
+
+
+def get_client() -> SlurmRestClient | None:
+    """Return the shared client for ``$HPC_CONNECT_SLURMRESTD_SOCKET``, if set and usable"""
+    path = os.getenv("HPC_CONNECT_SLURMRESTD_SOCKET")
+    if not path:
+        return None
+    version = os.getenv("HPC_CONNECT_SLURMRESTD_VERSION") or API_VERSION
+    with _lock:
+        key = (path, version)
+        if key not in _clients:
+            _clients[key] = SlurmRestClient(path, version=version)
+        client = _clients[key]
+    return None if client.disabled else client
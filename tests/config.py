@@ -22,3 +22,53 @@ def test_config_launch_basic(tmpdir):
         assert backend["launch"]["default_options"] == ["-a", "-b"]
     finally:
         os.chdir(cwd)
+
+
+def test_no_entrypoints(monkeypatch):
+    from hpc_connect.local import LocalBackend
+    from hpc_connect.pluginmanager import HPCConnectPluginManager
+
+    monkeypatch.setenv("HPC_CONNECT_NO_ENTRYPOINTS", "1")
+    pm = HPCConnectPluginManager()
+    assert pm.backend_types() == [LocalBackend]
+    pm.consider_plugin("hpcc_slurm")
+    assert len(pm.backend_types()) == 2
+
+
+def test_validate_memoized():
+    from hpc_connect.schemas import launch_schema
+
+    config = {"type": "mpi", "default_options": "-a -b"}
+    one = launch_schema.validate_memoized(config)
+    assert one["default_options"] == ["-a", "-b"]
+    one["default_options"].append("-c")
+    assert launch_schema.validate_memoized(config)["default_options"] == ["-a", "-b"]
+    assert config == {"type": "mpi", "default_options": "-a -b"}
+
+    config = {"type": "mpi", "default_options": ["-a"], "mpmd": {"local_options": ["-x"]}}
+    launch_schema.validate_memoized(config)
+    config["default_options"].append("-b")
+    config["mpmd"]["local_options"].append("-y")
+    fresh = {"type": "mpi", "default_options": ["-a"], "mpmd": {"local_options": ["-x"]}}
+    validated = launch_schema.validate_memoized(fresh)
+    assert validated["default_options"] == ["-a"]
+    assert validated["mpmd"]["local_options"] == ["-x"]
+
+
+def test_flag_splitter():
+    import pytest
+
+    from hpc_connect.schemas import flag_splitter
+
+    assert flag_splitter("-a 'b c'") == ["-a", "b c"]
+    assert flag_splitter(["-a"]) == ["-a"]
+    with pytest.raises(ValueError):
+        flag_splitter(["-a", 1])  # type: ignore
+    with pytest.raises(ValueError):
+        flag_splitter(1)  # type: ignore
+
+
+def test_backends():
+    names = hpc_connect.backends()
+    assert "local" in names
+    assert all(isinstance(name, str) for name in names)
@@ -163,3 +163,69 @@ def test_count_procs(tmpdir):
         args = parser.parse_args(argv)
         assert args[0].processes == 4
         assert args[1].processes == 5
+
+
+def test_argp():
+    from hpc_connect.launch import argp
+
+    assert argp(["-n", "4", "--bind-to=core", "ls", "-la"]) == 3
+    assert argp(["-n", "4", "not-a-program"]) == -1
+
+
+def test_which_follows_path(tmpdir):
+    from hpc_connect.util import which
+
+    exe = Path(tmpdir.strpath) / "my-program"
+    exe.write_text("#!/bin/sh\n")
+    exe.chmod(0o755)
+    assert which("my-program") is None
+    with envmods(PATH=f"{tmpdir.strpath}{os.pathsep}{os.environ['PATH']}"):
+        assert which("my-program") == str(exe)
+    assert which("my-program") is None
+
+    # a program installed after a failed lookup is found
+    later = Path(tmpdir.strpath) / "later"
+    with envmods(PATH=tmpdir.strpath):
+        assert which("later") is None
+        later.write_text("#!/bin/sh\n")
+        later.chmod(0o755)
+        assert which("later") == str(later)
+
+
+def test_launchspec_repr():
+    from hpc_connect.launch import LaunchSpec
+
+    spec = LaunchSpec(["-n", "4", "my program"])
+    assert repr(spec) == "LaunchSpec(-n 4 'my program')"
+    assert repr(spec) == "LaunchSpec(-n 4 'my program')"
+    spec.args.append("-a")
+    assert repr(spec) == "LaunchSpec(-n 4 'my program' -a)"
+
+
+def test_mpmd_global_options():
+    from hpc_connect.mpi import MPIExecAdapter
+
+    backend = hpc_connect.get_backend("local")
+    config = dict(backend.config["launch"])
+    config["default_options"] = ["--bind-to", "core"]
+    config["mpmd"] = {"global_options": ["--total=%(np)d"], "local_options": []}
+    adapter = MPIExecAdapter(config=config, backend=backend)
+    argv = adapter.build_argv(["-n", "4", "ls", ":", "-n", "5", "ls", "-a"])
+    assert argv[1:] == ["--total=9", "--bind-to", "core", "-n", "4", "ls", ":", "-n", "5", "ls", "-a"]
+
+
+def test_program_installed_later(tmpdir):
+    from hpc_connect.launch import ArgumentParser
+    from hpc_connect.launch import LaunchSpec
+
+    parser = ArgumentParser()
+    exe = Path(tmpdir.strpath) / "my-program"
+    (Path(tmpdir.strpath) / "not-executable").write_text("")
+    with envmods(PATH=f"{tmpdir.strpath}{os.pathsep}{os.environ['PATH']}"):
+        assert len(parser.parse_args(["-n", "2", "ls"])) == 1
+        exe.write_text("#!/bin/sh\n")
+        exe.chmod(0o755)
+        specs = parser.parse_args(["-n", "2", "my-program", "-n", "7", ":", "-n", "3", "ls"])
+        assert [spec.processes for spec in specs] == [2, 3]
+        assert specs[0].partition()[1] == ["my-program", "-n", "7"]
+        assert LaunchSpec(["-n", "2", "not-executable"]).partition()[0] == []
@@ -0,0 +1,330 @@
+# Copyright NTESS. See COPYRIGHT file for details.
+#
+# SPDX-License-Identifier: MIT
+
+from pathlib import Path
+
+import hpc_connect
+from hpc_connect.local import LocalBackend
+
+
+def test_submit_many(tmpdir):
+    workspace = Path(tmpdir.strpath)
+    backend = LocalBackend()
+    specs = [
+        hpc_connect.JobSpec(
+            f"job-{i}",
+            [f"exit {i}"],
+            output=str(workspace / f"job-{i}.out"),
+            workspace=workspace,
+        )
+        for i in range(4)
+    ]
+    futures = backend.submission_manager().submit_many(specs)
+    assert [f.result(timeout=30) for f in futures] == [0, 1, 2, 3]
+
+
+def test_resource_view_is_memoized():
+    backend = hpc_connect.get_backend("local")
+    view = backend.resource_view(ranks=1)
+    assert view["np"] == 1
+    view["np"] = 100
+    assert backend.resource_view(ranks=1)["np"] == 1
+    assert list(backend._resource_views) == [(1, None)]
+
+
+def test_future_wakes_on_exit():
+    import time
+
+    import pytest
+
+    from hpc_connect.futures import Future
+    from hpc_connect.local import Subprocess
+
+    proc = Subprocess(["sleep", "0.1"], output=None, error=None)
+    if proc.pidfd is None:
+        pytest.skip("no pidfd: the monitor is not notified when the process exits")
+    start = time.monotonic()
+    future = Future(proc, polling_interval=60.0)
+    # the monitor returns as soon as the process exits, not after its first wait (60 / 8 seconds)
+    assert future.result(timeout=10.0) == 0
+    assert time.monotonic() - start < 2.0
+
+
+def test_future_wakes_with_many_fds_open():
+    import os
+    import resource
+    import select
+
+    import pytest
+
+    from hpc_connect.futures import Future
+    from hpc_connect.local import Subprocess
+
+    # select() cannot watch descriptors numbered FD_SETSIZE (1024) or higher
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    want = 1200
+    if hard != resource.RLIM_INFINITY and hard < want:
+        pytest.skip(f"RLIMIT_NOFILE hard limit {hard} is too low")
+    resource.setrlimit(resource.RLIMIT_NOFILE, (max(soft, want), hard))
+    fds: list[int] = []
+    try:
+        while not fds or fds[-1] < 1100:
+            fds.append(os.open(os.devnull, os.O_RDONLY))
+        proc = Subprocess(["sleep", "0.3"], output=None, error=None)
+        if proc.pidfd is None or not hasattr(select, "poll"):
+            pytest.skip("no pidfd: the monitor is not notified when the process exits")
+        assert proc.pidfd >= 1024
+        assert Future(proc, polling_interval=60.0).result(timeout=5.0) == 0
+    finally:
+        for fd in fds:
+            os.close(fd)
+        resource.setrlimit(resource.RLIMIT_NOFILE, (soft, hard))
+
+
+def test_future_backs_off():
+    from hpc_connect.futures import Future
+    from hpc_connect.local import Subprocess
+
+    proc = Subprocess(["sleep", "0.1"], output=None, error=None)
+    proc.pidfd = None  # poll without being notified of the exit
+    waits: list[float] = []
+    wait = proc.wait
+    proc.wait = lambda timeout: waits.append(timeout) or wait(timeout)  # type: ignore
+    future = Future(proc, polling_interval=4.0)
+    # the first polls come at a fraction of polling_interval
+    assert future.result(timeout=3.0) == 0
+    assert waits[0] == 0.5
+
+    # processes whose poll runs a scheduler command are not polled sooner than configured
+    proc = Subprocess(["sleep", "0.1"], output=None, error=None)
+    proc.pidfd, proc.cheap_poll = None, False
+    waits.clear()
+    wait = proc.wait
+    proc.wait = lambda timeout: waits.append(timeout) or wait(timeout)  # type: ignore
+    future = Future(proc, polling_interval=0.4)
+    assert future.result(timeout=3.0) == 0
+    assert waits == [0.4]
+
+
+def test_as_completed():
+    from hpc_connect.futures import Future
+    from hpc_connect.futures import as_completed
+    from hpc_connect.local import Subprocess
+
+    slow = Future(Subprocess(["sleep", "0.3"], output=None, error=None))
+    fast = Future(Subprocess(["true"], output=None, error=None))
+    assert list(as_completed([slow, fast], timeout=10.0)) == [fast, slow]
+
+    hung = Future(Subprocess(["sleep", "30"], output=None, error=None))
+    try:
+        list(as_completed([hung], timeout=0.2))
+    except TimeoutError:
+        assert hung.cancelled()
+    else:
+        assert False, "expected TimeoutError"
+
+
+def test_cancel_kills_process_group(tmpdir):
+    import os
+    import time
+
+    from hpc_connect.local import Subprocess
+
+    pidfile = Path(tmpdir.strpath) / "pid"
+    proc = Subprocess(["sh", "-c", f"sleep 30 & echo $! > {pidfile}; wait"], output=None, error=None)
+    for _ in range(100):
+        if pidfile.exists() and pidfile.read_text().strip():
+            break
+        time.sleep(0.05)
+    grandchild = int(pidfile.read_text())
+    proc.cancel()
+    assert proc.poll() is not None
+    for _ in range(100):
+        try:
+            os.kill(grandchild, 0)
+        except ProcessLookupError:
+            break
+        time.sleep(0.05)
+    else:
+        assert False, "grandchild survived cancel"
+
+
+def test_streamify(tmpdir, monkeypatch):
+    import shutil
+
+    from hpc_connect.local import streamify
+
+    monkeypatch.chdir(tmpdir.strpath)
+    # a bare file name has no directory to create
+    with streamify("out.txt") as fh:
+        fh.write("spam")
+    assert Path("out.txt").read_text() == "spam"
+    with streamify("a/b/out.txt") as fh:
+        fh.write("eggs")
+    shutil.rmtree("a")
+    with streamify("a/b/out.txt") as fh:
+        fh.write("ham")
+    assert Path("a/b/out.txt").read_text() == "ham"
+
+
+def test_hostfile(tmpdir, monkeypatch):
+    import json
+    import os
+
+    hostfile = Path(tmpdir.strpath) / "hosts.json"
+    node = {"type": "node", "count": 1, "resources": [{"type": "cpu", "count": 3}]}
+    hostfile.write_text(json.dumps({"spam*": [node]}))
+    monkeypatch.setenv("HPC_CONNECT_HOSTFILE", str(hostfile))
+    monkeypatch.setenv("HPC_CONNECT_HOSTNAME", "spam01")
+    specs = LocalBackend().resource_specs
+    assert specs == [node]
+    specs[0]["count"] = 10
+    assert LocalBackend().resource_specs == [node]
+    # an edited hostfile is read again
+    node["count"] = 2
+    hostfile.write_text(json.dumps({"spam*": [node]}))
+    st = hostfile.stat()
+    os.utime(hostfile, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    assert LocalBackend().resource_specs == [node]
+
+
+def test_write_executable(tmpdir):
+    import os
+    import stat
+
+    import pytest
+
+    from hpc_connect.util import write_executable
+
+    script = Path(tmpdir.strpath) / "scripts" / "job.sh"
+    with pytest.raises(FileNotFoundError):
+        write_executable(script, "true\n")
+    write_executable(script, "true\n", mkdir=True)
+    assert os.stat(script).st_mode & stat.S_IXUSR
+    assert script.read_text() == "true\n"
+    write_executable(script, "exit 3\n")
+    assert script.read_text() == "exit 3\n"
+    # an existing script that is not executable is made so when overwritten
+    os.chmod(script, 0o644)
+    write_executable(script, "exit 4\n")
+    assert stat.S_IMODE(os.stat(script).st_mode) == 0o755
+    os.chmod(script, 0o600)
+    write_executable(script, "exit 5\n")
+    assert stat.S_IMODE(os.stat(script).st_mode) == 0o700
+
+
+def test_template_envs_are_not_shared(tmpdir):
+    from hpc_connect.util import make_template_env
+
+    (Path(tmpdir.strpath) / "t.txt").write_text("{{ greet(name) }}")
+    env = make_template_env(tmpdir.strpath)
+    env.globals["greet"] = lambda name: f"hello {name}"
+    assert env.get_template("t.txt").render(name="x") == "hello x"
+    other = make_template_env(tmpdir.strpath)
+    assert "greet" not in other.globals
+    assert other.loader is env.loader
+    other.globals["greet"] = lambda name: f"bye {name}"
+    assert other.get_template("t.txt").render(name="x") == "bye x"
+
+
+def test_nodes_required():
+    backend = LocalBackend({"type": "local", "config": {"cores_per_socket": 4, "nnode": 3}})
+    assert backend.count_per_node("cpu") == 4
+    assert backend.count_per_node("gpu", default=0) == 0
+    assert backend.nodes_required(cpu=1) == 1
+    assert backend.nodes_required(cpu=4) == 1
+    assert backend.nodes_required(cpu=5) == 2
+    assert backend.nodes_required(max_cpus=9) == 3
+    assert backend.nodes_required(cpu=9, gpu=4) == 3
+
+
+def test_live_job_groups_killed_at_exit():
+    from hpc_connect.local import Subprocess
+    from hpc_connect.local import kill_live_job_groups
+    from hpc_connect.local import live_job_groups
+
+    proc = Subprocess(["sleep", "30"], output=None, error=None)
+    assert live_job_groups[proc.proc.pid] is proc.proc
+    kill_live_job_groups(timeout=5.0)
+    assert proc.proc.poll() is not None
+    assert proc.proc.pid not in live_job_groups
+
+
+def test_live_job_groups_survive_normal_exit():
+    import os
+    import signal
+    import subprocess
+    import sys
+    import time
+
+    # a job left running at a normal exit keeps running; one left at an uncaught exception does not
+    code = (
+        "import sys\n"
+        "from hpc_connect.local import Subprocess\n"
+        "job = Subprocess(['sleep', '30'], output='/dev/null', error='/dev/null')\n"
+        "print(job.proc.pid, flush=True)\n"
+        "if sys.argv[1] == 'raise':\n"
+        "    raise RuntimeError\n"
+    )
+    for how, survives in (("exit", True), ("raise", False)):
+        p = subprocess.run([sys.executable, "-c", code, how], capture_output=True, text=True)
+        pid = int(p.stdout.split()[0])
+        time.sleep(0.1)
+        try:
+            os.killpg(pid, 0)
+            alive = True
+        except ProcessLookupError:
+            alive = False
+        if alive:
+            os.killpg(pid, signal.SIGKILL)
+        assert alive is survives
+
+
+def test_interrupt_cancels_local_job():
+    import pytest
+
+    from hpc_connect.futures import Future
+    from hpc_connect.local import Subprocess
+
+    def interrupted_wait(timeout=None):
+        raise KeyboardInterrupt
+
+    future = Future(Subprocess(["sleep", "30"], output=None, error=None))
+    future._done.wait = interrupted_wait  # type: ignore
+    with pytest.raises(KeyboardInterrupt):
+        future.result(timeout=20.0)
+    assert future.cancelled()
+    assert future.proc.proc.wait(timeout=10.0) is not None
+
+
+def test_submit_many_cancels_on_failure(tmpdir):
+    import pytest
+
+    from hpc_connect.submit import HPCSubmissionManager
+
+    workspace = Path(tmpdir.strpath)
+    backend = LocalBackend()
+    adapter = backend.submission_manager().adapter
+    submitted = []
+
+    class Adapter:
+        def polling_interval(self):
+            return 1.0
+
+        def submit(self, spec, exclusive=True):
+            if spec.name == "bad":
+                raise hpc_connect.SubmissionFailedError
+            proc = adapter.submit(spec, exclusive=exclusive)
+            submitted.append(proc)
+            return proc
+
+    specs = [
+        hpc_connect.JobSpec(name, ["sleep 30"], workspace=workspace)
+        for name in ("good-1", "bad", "good-2")
+    ]
+    with pytest.raises(hpc_connect.SubmissionFailedError):
+        HPCSubmissionManager(adapter=Adapter()).submit_many(specs)
+    assert len(submitted) == 2
+    for proc in submitted:
+        assert proc.proc.wait(timeout=10.0) is not None
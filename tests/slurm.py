@@ -2,13 +2,20 @@
 #
 # SPDX-License-Identifier: MIT
 
+import http.server
+import json
 import os
+import socketserver
 import tempfile
+import threading
 from pathlib import Path
 
 import hpc_connect
 import hpcc_slurm.backend
 import hpcc_slurm.process
+import hpcc_slurm.restd
+
+mock_bin = os.path.join(os.path.dirname(__file__), "mock")
 
 
 def test_basic(tmpdir):
@@ -58,5 +65,245 @@ export MY_VAR=SPAM
 printenv || true
 ls""")
         fh.seek(0)
-        ns = hpcc_slurm.process.SlurmProcess.parse_script_args(fh.name)
-        assert ns.clusters == "flight,eclipse"
+        clusters = hpcc_slurm.process.SlurmProcess.parse_script_args(fh.name)
+        assert clusters == "flight,eclipse"
+
+
+def test_submit_clusters(tmpdir):
+    workspace = Path(tmpdir.strpath)
+    backend = hpcc_slurm.backend.SlurmBackend()
+    spec = hpc_connect.JobSpec(
+        "my-job",
+        ["ls"],
+        cpus=1,
+        nodes=1,
+        workspace=workspace,
+        time_limit=1.0,
+        submit_args=["--clusters=flight"],
+    )
+    proc = backend.submission_manager().adapter.submit(spec)
+    assert proc.jobid == "abc123"
+    assert proc.clusters == "flight"
+    # sbatch is handed the script itself, and the record says so
+    meta = json.loads((workspace / "submit.meta.json").read_text())["meta"]
+    assert meta["args"] == f"{mock_bin}/sbatch {workspace / 'my-job.sh'}"
+
+
+def test_submit_clusters_from_env(tmpdir, monkeypatch):
+    monkeypatch.setenv("SLURM_CLUSTERS", "landing")
+    workspace = Path(tmpdir.strpath)
+    backend = hpcc_slurm.backend.SlurmBackend()
+    spec = hpc_connect.JobSpec("my-job", ["ls"], cpus=1, nodes=1, workspace=workspace)
+    proc = backend.submission_manager().adapter.submit(spec)
+    assert proc.clusters == "landing"
+    # the environment takes precedence over the adapter's --clusters, as it does for sbatch
+    spec = spec.with_updates(submit_args=["--clusters=flight"])
+    proc = backend.submission_manager().adapter.submit(spec)
+    assert proc.clusters == "landing"
+
+
+def test_submit_cluster_from_sbatch(tmpdir, monkeypatch):
+    sbatch = Path(tmpdir.strpath) / "sbatch"
+    sbatch.write_text("#!/bin/sh\necho 'Submitted batch job 7 on cluster moon'\n")
+    sbatch.chmod(0o755)
+    monkeypatch.setenv("PATH", f"{tmpdir.strpath}{os.pathsep}{os.environ['PATH']}")
+    monkeypatch.setenv("SLURM_CLUSTERS", "landing")
+    workspace = Path(tmpdir.strpath)
+    backend = hpcc_slurm.backend.SlurmBackend()
+    spec = hpc_connect.JobSpec(
+        "my-job", ["ls"], cpus=1, nodes=1, workspace=workspace, submit_args=["--clusters=flight"]
+    )
+    proc = backend.submission_manager().adapter.submit(spec)
+    assert (proc.jobid, proc.clusters) == ("7", "moon")
+
+
+def test_restd_job_info(tmpdir, monkeypatch):
+    class Handler(http.server.BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def address_string(self):
+            return "localhost"
+
+        def do_GET(self):
+            requests.append(self.path)
+            if not self.path.startswith("/slurm/v0.0.41/"):
+                self.send_response(404)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            assert self.path == "/slurm/v0.0.41/job/abc123"
+            job = {"job_state": ["COMPLETED"], "exit_code": {"return_code": 3, "signal": {}}}
+            body = json.dumps({"jobs": [job]}).encode()
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    class Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+        daemon_threads = True
+
+    requests: list[str] = []
+    path = os.path.join(tmpdir.strpath, "slurmrestd.socket")
+    monkeypatch.setenv("HPC_CONNECT_SLURMRESTD_SOCKET", path)
+    with Server(path, Handler) as server:
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        try:
+            monkeypatch.setenv("HPC_CONNECT_SLURMRESTD_VERSION", "v0.0.41")
+            client = hpcc_slurm.restd.get_client()
+            for _ in range(2):
+                info = client.job_info("abc123")
+                assert info == {"state": "COMPLETED", "returncode": 3, "signal": 0}
+            # an API version slurmrestd does not serve disables the client after one request
+            monkeypatch.setenv("HPC_CONNECT_SLURMRESTD_VERSION", "v0.0.1")
+            client = hpcc_slurm.restd.get_client()
+            assert client.job_info("abc123") is None
+            assert hpcc_slurm.restd.get_client() is None
+            assert client.job_info("abc123") is None
+            assert requests.count("/slurm/v0.0.1/job/abc123") == 1
+        finally:
+            server.shutdown()
+
+
+def test_acct_poller_shares_queries(monkeypatch):
+    class Proc:
+        def __init__(self, jobid, clusters=None):
+            self.jobid = jobid
+            self.clusters = clusters
+
+    calls = []
+
+    def read_acct_data(jobids, clusters=None, max_tries=20):
+        calls.append((sorted(jobids), clusters))
+        return {j: {"state": "RUNNING", "returncode": 0, "signal": 0} for j in jobids}
+
+    monkeypatch.setattr(hpcc_slurm.process, "read_acct_data", read_acct_data)
+    poller = hpcc_slurm.process.AcctPoller(ttl=60.0)
+    procs = [Proc("1"), Proc("2"), Proc("3", clusters="flight")]
+    for proc in procs:
+        poller.add(proc)
+    for proc in procs:
+        assert poller.jobinfo(proc)["state"] == "RUNNING"
+    assert sorted(calls, key=str) == [(["1", "2"], None), (["3"], "flight")]
+    poller.discard(procs[0])
+    assert poller.jobinfo(procs[0]) is None
+
+
+def test_cancel_futures_batches_scancel(monkeypatch):
+    from hpc_connect.futures import Future
+    from hpc_connect.futures import cancel_futures
+
+    calls = []
+    monkeypatch.setattr(hpcc_slurm.process, "scancel", calls.append)
+    futures = []
+    for jobid in ("1", "2", "3"):
+        proc = object.__new__(hpcc_slurm.process.SlurmProcess)
+        proc.jobid, proc._rc, proc.last_poll, proc.poll_interval = jobid, None, float("inf"), 1.0
+        futures.append(Future(proc, polling_interval=60.0))
+    cancel_futures(futures)
+    assert calls == [["1", "2", "3"]]
+    assert all(f.cancelled() and f.done() and f.returncode == 1 for f in futures)
+    futures[0].proc.cancel()
+    assert calls[-1] == ["1"]
+
+
+def test_single_node_allocation(tmpdir, monkeypatch):
+    import hpcc_slurm.discover
+
+    # 2 sockets x 2 cores x 2 hardware threads
+    sysfs = Path(tmpdir.strpath)
+    for cpu in range(8):
+        topology = sysfs / f"cpu{cpu}" / "topology"
+        topology.mkdir(parents=True)
+        (topology / "physical_package_id").write_text(f"{cpu // 4}\n")
+        (topology / "core_id").write_text(f"{cpu % 4 // 2}\n")
+    monkeypatch.setattr(hpcc_slurm.discover, "SYSFS_CPU", str(sysfs))
+    monkeypatch.setattr(os, "sched_getaffinity", lambda pid: set(range(8)), raising=False)
+    monkeypatch.setenv("SLURM_JOB_ID", "1")
+    monkeypatch.setenv("SLURM_NNODES", "1")
+    monkeypatch.setenv("SLURM_GPUS_ON_NODE", "2")
+    monkeypatch.setenv("SLURMD_NODENAME", os.uname().nodename)
+    monkeypatch.setattr(hpcc_slurm.backend, "read_sinfo_cached", lambda: None)
+    backend = hpcc_slurm.backend.SlurmBackend()
+    assert backend.node_count == 1
+    assert backend.sockets_per_node == 2
+    assert backend.count_per_socket("cpu") == 2
+    assert backend.count_per_node("cpu") == 4
+    assert backend.count_per_node("gpu") == 2
+    # an salloc shell on the login node is not described by its own CPUs
+    monkeypatch.delenv("SLURMD_NODENAME")
+    assert hpcc_slurm.backend.SlurmBackend.allocation_spec() is None
+    monkeypatch.setenv("SLURMD_NODENAME", "compute-node-1")
+    assert hpcc_slurm.backend.SlurmBackend.allocation_spec() is None
+
+
+def test_read_sinfo_cached(monkeypatch):
+    import hpcc_slurm.discover
+
+    calls: list[int] = []
+
+    def read_sinfo():
+        calls.append(1)
+        return {"type": "node", "count": len(calls)}
+
+    monkeypatch.setattr(hpcc_slurm.discover, "read_sinfo", read_sinfo)
+    hpcc_slurm.discover._read_sinfo_once.cache_clear()
+    try:
+        info = hpcc_slurm.discover.read_sinfo_cached()
+        info["count"] = 100
+        assert hpcc_slurm.discover.read_sinfo_cached() == {"type": "node", "count": 1}
+        assert len(calls) == 1
+        # a tiny ttl puts every call in a new epoch
+        monkeypatch.setenv("HPC_CONNECT_SINFO_TTL", "1e-9")
+        hpcc_slurm.discover.read_sinfo_cached()
+        assert len(calls) == 2
+        # a failed sinfo is not remembered
+        monkeypatch.delenv("HPC_CONNECT_SINFO_TTL")
+        hpcc_slurm.discover._read_sinfo_once.cache_clear()
+        monkeypatch.setattr(hpcc_slurm.discover, "read_sinfo", lambda: calls.append(1))
+        assert hpcc_slurm.discover.read_sinfo_cached() is None
+        monkeypatch.setattr(hpcc_slurm.discover, "read_sinfo", read_sinfo)
+        assert hpcc_slurm.discover.read_sinfo_cached() == {"type": "node", "count": 4}
+    finally:
+        hpcc_slurm.discover._read_sinfo_once.cache_clear()
+
+
+def test_read_queue_state(tmpdir, monkeypatch):
+    squeue = Path(tmpdir.strpath) / "squeue"
+    squeue.write_text(
+        "#!/bin/sh\n"
+        'if [ "$1" = "--help" ]; then echo "      --only-job-state"; exit 0; fi\n'
+        "fmt=\n"
+        'while [ $# -gt 0 ]; do [ "$1" = "-o" ] && fmt="$2"; shift; done\n'
+        'if [ "$fmt" != "%i %T" ]; then\n'
+        "  echo '12 debug my-job me R 0:01 1 node1'\n"
+        "  exit 0\n"
+        "fi\n"
+        "echo 'CLUSTER: flight'\n"
+        "echo '12 RUNNING'\n"
+        "echo '13 PENDING'\n"
+        "echo '14 COMPLETING'\n"
+    )
+    squeue.chmod(0o755)
+    monkeypatch.setenv("PATH", f"{tmpdir.strpath}{os.pathsep}{os.environ['PATH']}")
+    data = hpcc_slurm.process.read_queue_state(["12", "13", "14"], clusters="flight")
+    assert data == {
+        "12": {"state": "RUNNING", "returncode": 0, "signal": 0},
+        "13": {"state": "PENDING", "returncode": 0, "signal": 0},
+    }
+
+
+def test_read_acct_data(tmpdir, monkeypatch):
+    sacct = Path(tmpdir.strpath) / "sacct"
+    sacct.write_text(
+        "#!/bin/sh\n"
+        "echo '12|COMPLETED|0:0|'\n"
+        "echo '12.batch|COMPLETED|0:0|'\n"
+        "echo '13|CANCELLED by 42|0:15|'\n"
+        "echo '14|FAILED|3|'\n"
+    )
+    sacct.chmod(0o755)
+    monkeypatch.setenv("PATH", f"{tmpdir.strpath}{os.pathsep}{os.environ['PATH']}")
+    data = hpcc_slurm.process.read_acct_data(["12", "13", "14"])
+    assert data["12"] == {"state": "COMPLETED", "returncode": 0, "signal": 0}
+    assert data["13"] == {"state": "CANCELLED", "returncode": 0, "signal": 15}
+    assert data["14"] == {"state": "FAILED", "returncode": 3, "signal": 0}